@@ -0,0 +1,197 @@
+"""Synthetic WDBC files built from any table of a definition build.
+
+    python -m bench.generate Spell Achievement -n 100000 -o synthetic/
+    python -m bench.generate --all -d "TBC 2.4.3 (8606).xml" -n 1000 -o synthetic/
+
+Values follow the shape of real client data: ascending IDs with gaps,
+mostly-zero integer fields, bit flags, small foreign key ranges, rounded
+floats, and text drawn from a pool of `strings` distinct values, with
+the non-English locales left mostly empty.
+
+With `--layout client` the string block is laid out unlike save_dbc's:
+a leading empty string, each column's strings in shuffled order, and no
+sharing, so strings used by several columns are stored more than once.
+"""
+import argparse
+import os
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dbc.dbc_format import field_layout, FIELD_DTYPES
+from dbc.string_block import StringBlockBuilder
+from core.relations import table_names
+from definitions_handler import DefinitionsHandler, DEFINITIONS_DIR, DEFAULT_LOCALE
+
+DEFAULT_DEFINITION = "WotLK 3.3.5 (12340).xml"
+WORDS = ('Fire', 'Frost', 'Shadow', 'Holy', 'Arcane', 'Nature', 'Bolt', 'Shield', 'Strike', 'Ward',
+         'Blessing', 'Curse', 'Totem', 'Aura', 'Rune', 'Storm', 'Blade', 'Heart', 'Spirit', 'Stone')
+LOCALE_FILL = 0.05  # Share of rows with text in the other locales of a loc field
+LOC_FLAGS = 0x00FF01FE  # Typical value of a loc field's flags column
+LAYOUTS = ('saved', 'client')  # String block as save_dbc writes it, or ordered and duplicated differently
+
+def load_fields(table_name: str, definition_file: str = DEFAULT_DEFINITION) -> list:
+    """Expanded fields of a table in a definition build"""
+    handler = DefinitionsHandler()
+    path = Path(definition_file)
+    if not path.exists():
+        path = Path(DEFINITIONS_DIR) / definition_file
+    if not handler.load_definition(str(path)):
+        raise ValueError(f"Cannot load definition {definition_file}")
+    fields = handler.get_field_names(table_name)
+    if not fields:
+        raise KeyError(f"{table_name} is not defined in {definition_file}")
+    return fields
+
+def _text_pool(rng: np.random.Generator, count: int, prefix: str) -> np.ndarray:
+    """Distinct strings; some are tails of others so the block builder can share their bytes"""
+    first = rng.choice(WORDS, count)
+    second = rng.choice(WORDS, count)
+    pool = [f"{prefix}_{a}{b}_{i}" if i % 4 else f"{a} {b} {i}" for i, (a, b) in enumerate(zip(first, second))]
+    for i in range(0, count - 1, 10):
+        pool[i + 1] = pool[i][len(prefix) + 1:]  # A suffix of its neighbour
+    return np.array(list(dict.fromkeys(pool)), dtype=object)
+
+def _int_values(rng: np.random.Generator, name: str, rows: int, dtype: np.dtype) -> np.ndarray:
+    limits = np.iinfo(dtype)
+    high = min(int(limits.max), 2 ** 31 - 1)
+    lowered = name.lower()
+    if 'flag' in lowered or 'mask' in lowered:
+        bits = rng.random((rows, 8)) < 0.15
+        values = (bits * (1 << rng.integers(0, min(31, dtype.itemsize * 8 - 1), 8))).sum(axis=1)
+    elif lowered.endswith('id') or lowered.endswith('_id'):
+        values = rng.integers(0, min(high, 5000), rows) * (rng.random(rows) < 0.4)
+    else:
+        values = rng.zipf(2.0, rows) * (rng.random(rows) < 0.3)
+    return np.clip(values, max(int(limits.min), 0), high).astype(dtype)
+
+def generate_records(fields: list, rows: int, strings: int = 1000, seed: int = 0, layout: str = 'saved'):
+    """Structured records and string block of a synthetic table.
+
+    With the 'saved' layout the block is laid out the way DBCHandler.save_dbc
+    writes one (columns in order, values in order of first use), so loading
+    and re-saving an unedited file reproduces it byte for byte. The 'client'
+    layout stores the same text in a different order and with duplicates,
+    so a save must rebuild the block and only the values survive.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown string block layout {layout}, use one of {', '.join(LAYOUTS)}")
+    rng = np.random.default_rng(seed)
+    types = [field['type'] for field in fields]
+    dtype = field_layout(types)
+    records = np.zeros(rows, dtype=dtype)
+    builder = StringBlockBuilder()
+    pool = _text_pool(rng, max(1, strings), "Synthetic")
+    text_columns = []  # (field position, per-row pool index or -1 for empty)
+
+    for field_idx, (field, name) in enumerate(zip(fields, dtype.names)):
+        field_type = field['type']
+        column_dtype = np.dtype(FIELD_DTYPES.get(field_type, '<u4'))
+        if field.get('is_index') or (field_idx == 0 and field['name'] == 'ID'):
+            records[name] = np.cumsum(rng.integers(1, 4, rows)).astype(column_dtype)
+        elif field_type in ('string', 'loc'):
+            fill = LOCALE_FILL if field.get('locale') not in (None, DEFAULT_LOCALE) else 0.9
+            picks = np.where(rng.random(rows) < fill, rng.integers(0, len(pool), rows), -1)
+            text_columns.append((field_idx, picks))
+        elif field.get('loc_field') is not None:
+            records[name] = LOC_FLAGS
+        elif field_type == 'float':
+            values = np.round(rng.normal(0, 50, rows), 2) * (rng.random(rows) < 0.5)
+            records[name] = values.astype(column_dtype)
+        elif field_type == 'bool':
+            records[name] = rng.random(rows) < 0.2
+        else:
+            records[name] = _int_values(rng, field['name'], rows, column_dtype)
+
+    if layout == 'client':
+        block, lookups = _client_block(rng, pool, text_columns)
+        for field_idx, picks in text_columns:
+            records[dtype.names[field_idx]] = lookups[field_idx][picks]
+        return records, block
+
+    offsets_of = {}
+    for field_idx, picks in text_columns:
+        # Distinct values in order of first use, like pandas.factorize on save
+        used, first_rows = np.unique(picks, return_index=True)
+        used = used[np.argsort(first_rows)]
+        values = ['' if pick < 0 else pool[pick] for pick in used]
+        offsets_of[field_idx] = (used, builder.add(values))
+    block, offsets = builder.build()
+    for field_idx, picks in text_columns:
+        used, ids = offsets_of[field_idx]
+        lookup = np.zeros(len(pool) + 1, dtype=np.uint32)  # Last slot is pick -1, the empty string
+        lookup[used] = offsets[ids]
+        records[dtype.names[field_idx]] = lookup[picks]
+    return records, block
+
+def _client_block(rng: np.random.Generator, pool: np.ndarray, text_columns: list):
+    """String block with its own copy of each column's strings, shuffled, after a leading empty string.
+
+    Returns the block and, per field position, the offset of each pool
+    index (last slot: pick -1, the empty string at offset 0).
+    """
+    parts = [b'\0']
+    size = 1
+    lookups = {}
+    for field_idx, picks in text_columns:
+        lookup = np.zeros(len(pool) + 1, dtype=np.uint32)
+        used = np.unique(picks[picks >= 0])
+        for pick in rng.permutation(used):
+            encoded = pool[pick].encode('utf-8') + b'\0'
+            lookup[pick] = size
+            parts.append(encoded)
+            size += len(encoded)
+        lookups[field_idx] = lookup
+    return b''.join(parts), lookups
+
+def write_dbc(path, records: np.ndarray, block: bytes, field_types: list):
+    """Write a WDBC file; 64-bit fields count as two fields in the header"""
+    field_count = sum(2 if field_type in ('long', 'ulong') else 1 for field_type in field_types)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'WDBC' + struct.pack('<4I', len(records), field_count, records.dtype.itemsize, len(block)))
+        records.tofile(f)
+        f.write(block)
+
+def generate(table_name: str, path, rows: int, strings: int = 1000, seed: int = 0,
+             definition_file: str = DEFAULT_DEFINITION, layout: str = 'saved') -> str:
+    """Write a synthetic copy of a table to path; returns the path"""
+    fields = load_fields(table_name, definition_file)
+    records, block = generate_records(fields, rows, strings, seed, layout)
+    write_dbc(path, records, block, [field['type'] for field in fields])
+    return str(path)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write synthetic DBC files from table definitions")
+    parser.add_argument('tables', nargs='*', help="Table names, e.g. Spell Achievement")
+    parser.add_argument('--all', action='store_true', help="Every table of the definition build")
+    parser.add_argument('-d', '--definition', default=DEFAULT_DEFINITION, help="Definition file")
+    parser.add_argument('-n', '--rows', type=int, default=10000, help="Records per table")
+    parser.add_argument('-s', '--strings', type=int, default=1000, help="Distinct strings per table")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layout', choices=LAYOUTS, default='saved',
+                        help="String block as save_dbc writes it, or shuffled with duplicates")
+    parser.add_argument('-o', '--output', default='synthetic', help="Output folder")
+    args = parser.parse_args(argv)
+
+    tables = args.tables
+    if args.all:
+        handler = DefinitionsHandler()
+        handler.load_definition(str(Path(DEFINITIONS_DIR) / args.definition))
+        tables = sorted(table_names(handler.definitions).values())
+    if not tables:
+        parser.error("name at least one table or pass --all")
+
+    for table_name in tables:
+        path = os.path.join(args.output, f"{table_name}.dbc")
+        try:
+            generate(table_name, path, args.rows, args.strings, args.seed, args.definition, args.layout)
+            print(f"{path} ({args.rows:,} records)")
+        except (KeyError, ValueError) as e:
+            print(f"Skipped {table_name}: {e}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""Benchmarks of the load, save and render paths on synthetic tables.
+
+    python -m bench.run                                  # compare with bench/baseline.json
+    python -m bench.run --save-baseline                  # record this machine's numbers
+    python -m bench.run -t Spell -n 200000 -s 20000 --threshold 0.15
+
+Every stage is warmed up, run `repeat` times and the fastest time is kept; its peak
+Python heap (numpy buffers included) comes from one extra run under
+tracemalloc. Each table is also loaded, saved and loaded again: the saved
+file must hold the same values and, when generated in save_dbc's own
+string block layout, match the generated file byte for byte. A second
+copy with a shuffled, duplicated string block checks that saving
+rebuilds the block without losing text. The exit status is 1 when a
+round trip fails or a stage got slower (or bigger) than the baseline by
+more than the threshold.
+"""
+import argparse
+import contextlib
+import filecmp
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bench.generate import DEFAULT_DEFINITION, generate, load_fields
+from dbc.dbc_format import DBCFile
+from dbc_handler import DBCHandler
+from definitions_handler import DEFINITIONS_DIR
+
+DEFAULT_TABLES = ('Achievement', 'ItemDisplayInfo', 'Spell')
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+PAGES = 50  # Pages flipped by the page building stage
+TIME_SLACK = 0.002  # Seconds a stage may lose before the threshold applies, timer noise on tiny stages
+MEMORY_SLACK_MB = 1
+
+class Sample:
+    """Time and peak traced memory of the block run under `with sample:`"""
+
+    def __init__(self):
+        self.seconds = None
+        self.peak_bytes = None
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        if tracemalloc.is_tracing():
+            self.peak_bytes = tracemalloc.get_traced_memory()[1] - self._base
+
+class Scenario:
+    """One synthetic table and the handlers the stages share"""
+
+    def __init__(self, table: str, path: str, definition: str, workdir: str):
+        self.table = table
+        self.path = path
+        self.definition = str(Path(DEFINITIONS_DIR) / definition)
+        self.field_types = [field['type'] for field in load_fields(table, definition)]
+        self.workdir = workdir
+        self.saved_path = os.path.join(workdir, "saved", f"{table}.dbc")
+        Path(self.saved_path).parent.mkdir(parents=True, exist_ok=True)
+
+    def handler(self, use_mmap: bool = False, load: bool = True, path: str = None) -> DBCHandler:
+        """A handler on the scenario's build with both caches off, so every load parses"""
+        handler = DBCHandler(use_mmap=use_mmap)
+        handler.table_cache = None
+        handler.memory_cache = None
+        handler.auto_detect_definition = False  # Other builds can share the layout
+        handler.load_definition_file(self.definition)
+        path = path or self.path
+        if load and not handler.load_dbc(path):
+            raise RuntimeError(f"Cannot load {path}")
+        return handler
+
+def stage_read_records(scenario: Scenario, sample: Sample):
+    dbc_file = DBCFile()
+    with sample:
+        dbc_file.load_file(scenario.path, scenario.field_types)
+
+def stage_read_records_mmap(scenario: Scenario, sample: Sample):
+    dbc_file = DBCFile()
+    with sample:
+        dbc_file.load_file(scenario.path, scenario.field_types, use_mmap=True)
+    dbc_file.close()
+
+def stage_optimize_datatypes(scenario: Scenario, sample: Sample):
+    handler = scenario.handler(load=False)
+    handler.dbc_file.load_file(scenario.path, scenario.field_types)
+    dataframe = handler._records_to_dataframe(handler.dbc_file.records)
+    with sample:
+        handler._optimize_datatypes(dataframe)
+
+def stage_load_dbc(scenario: Scenario, sample: Sample):
+    handler = scenario.handler(load=False)
+    with sample:
+        handler.load_dbc(scenario.path)
+
+def stage_load_dbc_mmap(scenario: Scenario, sample: Sample):
+    handler = scenario.handler(use_mmap=True, load=False)
+    with sample:
+        handler.load_dbc(scenario.path)
+    handler.cleanup()
+
+def stage_save_dbc(scenario: Scenario, sample: Sample):
+    handler = scenario.handler()
+    with sample:
+        handler.save_dbc(scenario.saved_path, handler.dataframe)
+
+class PageBench:
+    """A table view without a window on screen; Dear PyGui allows one per process"""
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        import dearpygui.dearpygui as dpg
+        from gui.file_manager import FileManager
+        from gui.table_view import TableView
+        self.dpg = dpg
+        dpg.create_context()
+        self.view = TableView()
+        self.manager = FileManager(self.view)
+        self.view.set_file_manager(self.manager)
+        with dpg.window(tag="primary_window"):
+            with dpg.group(horizontal=True):
+                self.manager.setup()
+                self.view.setup()
+
+    @classmethod
+    def close(cls):
+        if cls._instance is not None:
+            cls._instance.manager.worker.shutdown()
+            cls._instance.dpg.destroy_context()
+            cls._instance = None
+
+def stage_page_build(scenario: Scenario, sample: Sample):
+    """Flip through PAGES pages of the grid, decoding strings for the shown rows as the GUI does"""
+    bench = PageBench.get()
+    handler = scenario.handler(use_mmap=True)
+    bench.manager.dbc_handler = handler
+    bench.view.update_view(handler.dataframe)
+    with sample:
+        for _ in range(PAGES):
+            bench.view.change_page("next")
+    bench.view.update_view(None)
+    handler.cleanup()
+
+STAGES = {
+    'read_records': stage_read_records,
+    'read_records_mmap': stage_read_records_mmap,
+    'optimize_datatypes': stage_optimize_datatypes,
+    'load_dbc': stage_load_dbc,
+    'load_dbc_mmap': stage_load_dbc_mmap,
+    'save_dbc': stage_save_dbc,
+    'page_build': stage_page_build,
+}
+
+def same_values(first: pd.DataFrame, second: pd.DataFrame) -> bool:
+    """Same columns and values; dtypes may differ (a save widens columns back to their field type)"""
+    if list(first.columns) != list(second.columns) or len(first.index) != len(second.index):
+        return False
+    for col_idx in range(len(first.columns)):
+        a, b = first.iloc[:, col_idx], second.iloc[:, col_idx]
+        # Decoded text compares as plain strings, however each side's categories are ordered
+        a = a.to_numpy(dtype=object) if isinstance(a.dtype, pd.CategoricalDtype) else a.to_numpy()
+        b = b.to_numpy(dtype=object) if isinstance(b.dtype, pd.CategoricalDtype) else b.to_numpy()
+        numeric = a.dtype.kind in 'biuf' and b.dtype.kind in 'biuf'
+        if not np.array_equal(a, b, equal_nan=numeric and 'f' in (a.dtype.kind, b.dtype.kind)):
+            return False
+    return True
+
+def decoded(handler: DBCHandler) -> pd.DataFrame:
+    """The loaded table with its strings as text; offsets differ between string block layouts"""
+    return handler.get_page(slice(None))
+
+def round_trip(scenario: Scenario, path: str = None, byte_identical: bool = True) -> list:
+    """Problems found loading, saving and reloading a table; empty when the trip is lossless.
+
+    byte_identical also requires the saved file to equal the source, which
+    only holds for files in save_dbc's own string block layout.
+    """
+    path = path or scenario.path
+    saved_path = scenario.saved_path if path == scenario.path else os.path.join(
+        scenario.workdir, "resaved", os.path.basename(os.path.dirname(path)), f"{scenario.table}.dbc")
+    Path(saved_path).parent.mkdir(parents=True, exist_ok=True)
+    problems = []
+    first = scenario.handler(path=path)
+    loaded = decoded(first)
+    if not first.save_dbc(saved_path, first.dataframe):
+        return ["save failed"]
+    if byte_identical and not filecmp.cmp(path, saved_path, shallow=False):
+        problems.append("saved file differs from the generated one")
+
+    second = scenario.handler(load=False)
+    if not second.load_dbc(saved_path):
+        return problems + ["saved file does not load"]
+    if not same_values(loaded, decoded(second)):
+        problems.append("reloaded table differs from the loaded one")
+    resaved_path = saved_path + ".again"
+    if not second.save_dbc(resaved_path, second.dataframe) or not filecmp.cmp(
+            saved_path, resaved_path, shallow=False):
+        problems.append("saving the reloaded table gives different bytes")
+    return problems
+
+def measure(stage, scenario: Scenario, repeat: int) -> dict:
+    """Fastest of `repeat` runs after a warm-up run, and the peak heap of one traced run"""
+    stage(scenario, Sample())
+    times = []
+    for _ in range(repeat):
+        sample = Sample()
+        stage(scenario, sample)
+        times.append(sample.seconds)
+    sample = Sample()
+    tracemalloc.start()
+    try:
+        stage(scenario, sample)
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_mb': sample.peak_bytes / (1024 * 1024)}
+
+def compare(result: dict, baseline: dict, threshold: float, memory_threshold: float) -> list:
+    """Ways a stage got worse than its baseline"""
+    regressions = []
+    if baseline is None:
+        return regressions
+    if result['seconds'] > baseline['seconds'] * (1 + threshold) + TIME_SLACK:
+        regressions.append(f"{result['seconds'] / baseline['seconds'] - 1:+.0%} time")
+    if result['peak_mb'] > baseline['peak_mb'] * (1 + memory_threshold) + MEMORY_SLACK_MB:
+        regressions.append(f"{result['peak_mb'] / max(baseline['peak_mb'], 1e-9) - 1:+.0%} memory")
+    return regressions
+
+def run(tables, rows, strings, definition, stages, repeat, baseline, threshold, memory_threshold, workdir):
+    """Benchmark every table; returns (results by scenario and stage, failure messages)"""
+    results, failures = {}, []
+    for table in tables:
+        key = f"{table} x{rows} s{strings}"
+        path = os.path.join(workdir, f"{table}.dbc")
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate(table, path, rows, strings, definition_file=definition)
+            scenario = Scenario(table, path, definition, workdir)
+        print(f"{key}: {os.path.getsize(path) / (1024 * 1024):.1f} MB generated in "
+              f"{time.perf_counter() - started:.1f}s")
+
+        results[key] = {}
+        for name in stages:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = measure(STAGES[name], scenario, repeat)
+            except ImportError as e:
+                print(f"  {name:20} skipped ({e})")
+                continue
+            results[key][name] = result
+            expected = baseline.get(key, {}).get(name)
+            regressions = compare(result, expected, threshold, memory_threshold)
+            line = f"  {name:20} {result['seconds'] * 1000:10.1f} ms {result['peak_mb']:9.1f} MB peak"
+            if expected:
+                line += f"   (baseline {expected['seconds'] * 1000:.1f} ms, {expected['peak_mb']:.1f} MB)"
+            if regressions:
+                line += "  REGRESSED " + ", ".join(regressions)
+                failures.append(f"{key} {name}: " + ", ".join(regressions))
+            print(line)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            problems = round_trip(scenario)
+        print(f"  {'round trip':20} " + ("byte-identical" if not problems else "FAILED: " + "; ".join(problems)))
+        failures.extend(f"{key} round trip: {problem}" for problem in problems)
+
+        # Same table with the strings ordered and duplicated unlike save_dbc, the saved bytes differ
+        client_path = os.path.join(workdir, "client", f"{table}.dbc")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate(table, client_path, rows, strings, definition_file=definition, layout='client')
+            problems = round_trip(scenario, client_path, byte_identical=False)
+        print(f"  {'client round trip':20} " + ("same values" if not problems else "FAILED: " + "; ".join(problems)))
+        failures.extend(f"{key} client round trip: {problem}" for problem in problems)
+    PageBench.close()
+    return results, failures
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time and memory-profile DBC load, save and render stages")
+    parser.add_argument('-t', '--tables', nargs='+', default=list(DEFAULT_TABLES), help="Tables to generate")
+    parser.add_argument('-n', '--rows', type=int, default=50000, help="Records per table")
+    parser.add_argument('-s', '--strings', type=int, default=5000, help="Distinct strings per table")
+    parser.add_argument('-d', '--definition', default=DEFAULT_DEFINITION, help="Definition file to generate from")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="Timed runs per stage, the fastest counts")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline results (JSON)")
+    parser.add_argument('--save-baseline', action='store_true', help="Write these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--memory-threshold', type=float, default=0.10, help="Allowed peak memory growth")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--keep', help="Generate into this folder and keep the files")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.keep or stack.enter_context(tempfile.TemporaryDirectory(prefix="dbc_bench_"))
+        os.makedirs(workdir, exist_ok=True)
+        results, failures = run(args.tables, args.rows, args.strings, args.definition, args.stages,
+                                args.repeat, baseline, args.threshold, args.memory_threshold, workdir)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'failures': failures}, f, indent=2)
+
+    if failures:
+        print(f"{len(failures)} failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    if not baseline and not args.save_baseline:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to record one")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
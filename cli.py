@@ -0,0 +1,160 @@
+"""Headless batch processing of DBC files.
+
+    python cli.py validate DBFilesClient/ -r
+    python cli.py resave DBFilesClient/ -o out/ -j 8
+    python cli.py convert Spell.dbc --format csv -o csv/
+    python cli.py convert DBFilesClient/ --format npz -o tables/
+
+Nothing here imports the GUI, so it runs without a display.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from core.header_scan import find_dbc_files
+
+CONVERT_FORMATS = ('csv', 'json', 'npz', 'arrow', 'parquet')  # arrow and parquet need pyarrow
+
+_handler = None  # One DBCHandler per worker process
+_verbose = False
+
+def _init_worker(definition_file, verbose):
+    """Set up the worker's handler once; every build is loaded from the compiled index"""
+    global _handler, _verbose
+    from dbc_handler import DBCHandler
+    with _quiet(verbose):
+        _handler = DBCHandler(use_mmap=True)
+        # Batch runs read each file once, caching would only cost writes and memory
+        _handler.table_cache = None
+        _handler.memory_cache = None
+        if definition_file:
+            _handler.auto_detect_definition = False
+            if not _handler.load_definition_file(definition_file):
+                raise SystemExit(f"Cannot load definition file {definition_file}")
+        else:
+            _handler.definition_handler.store.load_all()
+    _verbose = verbose
+
+def _quiet(verbose):
+    """The handler reports progress with print, keep it out of batch output"""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+def _validate(handler, path) -> list:
+    """Problems found in a loaded file"""
+    problems = []
+    if not handler.definition_handler.get_field_names(handler.current_table_name):
+        problems.append("no definition for this table")
+    block_size = len(handler.dbc_file.string_block)
+    for col_idx in sorted(handler._unresolved_strings):
+        column = handler.dataframe.iloc[:, col_idx]
+        if len(column) and int(column.max()) >= block_size:
+            problems.append(f"{column.name}: string offset past the end of the string block")
+    if handler.primary_key.duplicates:
+        problems.append(f"{handler.primary_key.duplicates} duplicate IDs")
+    return problems
+
+def _output_path(output_dir, relative, suffix=None) -> str:
+    target = Path(output_dir) / relative
+    if suffix:
+        target = target.with_suffix(suffix)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return str(target)
+
+def _process(task) -> dict:
+    """Run one command on one file inside a worker"""
+    command, path, relative, options = task
+    handler = _handler
+    started = time.perf_counter()
+    result = {'path': path, 'bytes': os.path.getsize(path), 'ok': False, 'records': 0, 'messages': []}
+    try:
+        with _quiet(_verbose):
+            if not handler.load_dbc(path):
+                result['messages'].append("failed to load")
+                return result
+            result['records'] = len(handler.dataframe)
+
+            if command == 'validate':
+                result['messages'] = _validate(handler, path)
+                result['ok'] = not result['messages']
+            elif command == 'resave':
+                target = _output_path(options['output'], relative) if options['output'] else path
+                # Always through the writer, an unedited table would otherwise patch nothing
+                result['ok'] = handler.save_dbc(target, handler.dataframe, patch=False)
+            elif command == 'convert':
+                target = _output_path(options['output'] or os.path.dirname(path), relative, f".{options['format']}")
+                if options['format'] in ('csv', 'json'):
+                    table = handler.get_page(slice(None))
+                    if options['format'] == 'csv':
+                        table.to_csv(target, index=False)
+                    else:
+                        table.to_json(target, orient='records', lines=True, force_ascii=False)
+                    result['ok'] = True
+                else:
+                    # Columnar formats keep types and can be read back with DBCHandler.import_table
+                    result['ok'] = handler.export_table(target)
+    except Exception as e:
+        result['messages'].append(f"{type(e).__name__}: {e}")
+    finally:
+        result['seconds'] = time.perf_counter() - started
+    return result
+
+def collect_files(inputs, recursive) -> list:
+    """(path, path relative to its input) of every DBC file named or found in the inputs"""
+    files = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            files.extend((path, os.path.relpath(path, entry)) for path in find_dbc_files(entry, recursive))
+        elif os.path.isfile(entry):
+            files.append((entry, os.path.basename(entry)))
+        else:
+            print(f"Not found: {entry}", file=sys.stderr)
+    return files
+
+def run(command, files, options, jobs=None, definition_file=None, verbose=False) -> list:
+    """Process files on a pool of worker processes, printing one line per file"""
+    tasks = [(command, path, relative, options) for path, relative in files]
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(definition_file, verbose)) as executor:
+        for result in executor.map(_process, tasks, chunksize=max(1, len(tasks) // 64)):
+            status = "ok" if result['ok'] else "FAIL"
+            details = "; ".join(result['messages'])
+            print(f"{status:4} {result['path']} ({result['records']:,} records)" + (f": {details}" if details else ""))
+            results.append(result)
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Validate, convert and re-save DBC files without the GUI")
+    parser.add_argument('command', choices=['validate', 'resave', 'convert'])
+    parser.add_argument('inputs', nargs='+', help="DBC files or folders")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Include subfolders of input folders")
+    parser.add_argument('-o', '--output', help="Output folder (resave defaults to overwriting in place)")
+    parser.add_argument('-f', '--format', choices=CONVERT_FORMATS, default='csv', help="Format for convert")
+    parser.add_argument('-d', '--definition', help="Use this definition file instead of detecting the build")
+    parser.add_argument('-j', '--jobs', type=int, help="Worker processes (default: one per core)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show the handler's log output")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        print("No DBC files to process", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    results = run(args.command, files, {'output': args.output, 'format': args.format},
+                  args.jobs, args.definition, args.verbose)
+    elapsed = time.perf_counter() - started
+
+    failed = sum(not result['ok'] for result in results)
+    megabytes = sum(result['bytes'] for result in results) / (1024 * 1024)
+    print(f"{len(results)} files, {failed} failed, {megabytes:.1f} MB in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} files/s, {megabytes / elapsed:.1f} MB/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import ast
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dbc.dbc_format import FIELD_DTYPES
+
+ASSIGNMENT = re.compile(r'^\s*(`[^`]+`|[A-Za-z_]\w*)\s*=(?!=)(.+)$', re.S)
+QUOTED_NAME = re.compile(r'`([^`]+)`')
+TEXT_TYPES = ('string', 'loc')
+# Functions an expression may call besides methods of its columns
+FUNCTIONS = {'abs': np.abs, 'minimum': np.minimum, 'maximum': np.maximum, 'where': np.where}
+# Column methods an expression may call; anything else could reach pandas I/O such as to_csv
+SERIES_METHODS = {'abs', 'round', 'clip', 'between', 'isin', 'fillna', 'where', 'mask', 'str'}
+STR_METHODS = {'contains', 'startswith', 'endswith', 'lower', 'upper', 'title', 'capitalize', 'strip',
+               'lstrip', 'rstrip', 'replace', 'slice', 'len', 'pad', 'zfill'}
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.Name, ast.Load,
+                 ast.Constant, ast.Attribute, ast.Call, ast.keyword, ast.List, ast.Tuple,
+                 ast.operator, ast.unaryop, ast.cmpop, ast.boolop)
+
+class _Vectorize(ast.NodeTransformer):
+    """Rewrite Python's scalar logic into the element-wise operators Series understand"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(result, op, value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(ast.Invert(), node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                part = ast.Call(ast.Attribute(left, 'isin', ast.Load()), [right], [])
+                if isinstance(op, ast.NotIn):
+                    part = ast.UnaryOp(ast.Invert(), part)
+            else:
+                part = ast.Compare(left, [op], [right])
+            parts.append(part)
+            left = right
+        # a < b < c becomes (a < b) & (b < c)
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(result, ast.BitAnd(), part)
+        return result
+
+def compile_expression(text: str) -> Tuple[object, Dict[str, str]]:
+    """Code for an expression and the column each of its names stands for.
+
+    Only arithmetic, comparisons, FUNCTIONS and the column methods in
+    SERIES_METHODS/STR_METHODS are allowed; `and`/`or`/`not` and `in [...]`
+    work element-wise.
+    """
+    columns = {}
+
+    def quote(match):
+        name = f"c{len(columns)}_"
+        while name in text:
+            name += '_'
+        columns[name] = match.group(1)
+        return name
+
+    tree = ast.parse(QUOTED_NAME.sub(quote, text).strip(), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"{type(node).__name__} is not allowed in {text!r}")
+        if isinstance(node, ast.Attribute):
+            on_str = isinstance(node.value, ast.Attribute) and node.value.attr == 'str'
+            if node.attr not in (STR_METHODS if on_str else SERIES_METHODS):
+                raise ValueError(f"{'str.' if on_str else ''}{node.attr} is not allowed in {text!r}")
+        if isinstance(node, ast.Name) and node.id not in columns:
+            columns[node.id] = node.id
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    return compile(tree, '<bulk edit>', 'eval'), columns
+
+@dataclass
+class BulkEdit:
+    """`column = expression` applied to the rows where `where` holds (every row when None).
+
+    E.g. `Points = Points * 2` where `Category == 92`, or `Flags = Flags | 4`
+    where `(Flags & 2) == 2 and ID in [1, 2, 3]`. Column names that aren't
+    Python identifiers are quoted with backticks.
+    """
+    column: str
+    expression: str
+    where: Optional[str] = None
+
+    @classmethod
+    def parse(cls, assignment: str, where: Optional[str] = None) -> 'BulkEdit':
+        match = ASSIGNMENT.match(assignment)
+        if match is None:
+            raise ValueError(f"Expected 'Column = expression', got {assignment!r}")
+        column = match.group(1).strip('`')
+        return cls(column, match.group(2).strip(), (where or '').strip() or None)
+
+    def referenced_columns(self, columns) -> List[str]:
+        """Columns named in the expression or condition, in table order"""
+        names = set(compile_expression(self.expression)[1].values())
+        if self.where is not None:
+            names.update(compile_expression(self.where)[1].values())
+        return [column for column in columns if column in names]
+
+def _evaluate(dataframe: pd.DataFrame, text: str, rows=None, text_as_object: bool = False):
+    """Value of an expression over whole columns (or the given rows of them)"""
+    code, names = compile_expression(text)
+    namespace = dict(FUNCTIONS)
+    for name, column in names.items():
+        if column in FUNCTIONS:
+            continue
+        if column not in dataframe.columns:
+            raise KeyError(f"No column named {column}")
+        series = dataframe[column] if rows is None else dataframe[column].iloc[rows].reset_index(drop=True)
+        if text_as_object and isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)  # Text concatenation isn't defined on categoricals
+        elif series.dtype.kind in 'iu' and series.dtype.itemsize < 8:
+            series = series.astype(np.int64)  # Flags & ~4 would not fit an unsigned column's type
+        namespace[name] = series
+    return eval(code, {'__builtins__': {}}, namespace)
+
+def select_rows(dataframe: pd.DataFrame, edit: BulkEdit) -> np.ndarray:
+    """Row positions the condition holds for; a missing result counts as False"""
+    if edit.where is None:
+        return np.arange(len(dataframe.index))
+    mask = _evaluate(dataframe, edit.where)
+    if np.ndim(mask) == 0:
+        return np.arange(len(dataframe.index)) if bool(mask) else np.empty(0, dtype=np.int64)
+    mask = pd.Series(mask).fillna(False).to_numpy()
+    if mask.dtype != bool:
+        raise TypeError(f"Condition {edit.where!r} is not true/false per row")
+    return np.flatnonzero(mask)
+
+def evaluate(dataframe: pd.DataFrame, edit: BulkEdit, rows: np.ndarray) -> np.ndarray:
+    """New values of the target column for the selected rows"""
+    values = _evaluate(dataframe, edit.expression, rows, text_as_object=True)
+    if np.ndim(values) == 0:
+        return np.full(len(rows), values, dtype=object if isinstance(values, str) else None)
+    return pd.Series(values).to_numpy()
+
+def check_values(values: np.ndarray, column: str, column_type: Optional[str], dtype) -> np.ndarray:
+    """Values converted for a column, or TypeError/ValueError if the definition's type can't hold them"""
+    if column_type in TEXT_TYPES or isinstance(dtype, pd.CategoricalDtype):
+        if values.dtype != object or not all(isinstance(value, str) for value in values):
+            raise TypeError(f"{column} holds text, the expression gives {values.dtype}")
+        return values
+
+    if values.dtype.kind not in 'biuf':
+        raise TypeError(f"{column} holds numbers, the expression gives {values.dtype}")
+    if column_type == 'float' or np.dtype(dtype).kind == 'f':
+        return values.astype(np.float32 if column_type == 'float' else dtype)
+
+    if values.dtype.kind == 'f':
+        bad = ~np.isfinite(values) | (values != np.round(values))
+        if bad.any():
+            raise ValueError(f"{column} holds whole numbers, got {values[bad][0]}")
+    # The range is the one the file stores, the loaded column may be narrower
+    limits = np.iinfo(np.dtype(FIELD_DTYPES.get(column_type, dtype)))
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        raise ValueError(f"{column} values must be within {limits.min}..{limits.max}")
+    return values.astype(np.int64)
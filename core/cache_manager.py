@@ -1,16 +1,77 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
 class CacheManager:
-    def __init__(self, max_size=5):
-        self.cached_data = {}
-        self.max_cache_size = max_size
+    """LRU cache bounded by the memory its values use rather than their count.
+
+    Callers pass the size of each value in bytes. Once the total passes
+    max_bytes, the largest value outside the `hot_entries` most recently
+    used ones is evicted first, so one huge table that was left long ago
+    goes before several small ones that are flipped between.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, hot_entries: int = 2):
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # Key -> (value, size), oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
-    def get(self, key):
-        return self.cached_data.get(key)
+    def __contains__(self, key) -> bool:
+        return key in self._entries
 
-    def set(self, key, value):
-        if len(self.cached_data) >= self.max_cache_size:
-            oldest_key = next(iter(self.cached_data))
-            del self.cached_data[oldest_key]
-        self.cached_data[key] = value
+    def get(self, key, is_valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """The value stored under a key; one that fails is_valid is dropped and counts as a miss"""
+        entry = self._entries.get(key)
+        if entry is not None and is_valid is not None and not is_valid(entry[0]):
+            self.discard(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key, value, size: int) -> bool:
+        """Store a value as most recently used; values larger than the whole budget are not kept"""
+        self.discard(key)
+        if size > self.max_bytes:
+            return False
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+        self._evict(keep=key)
+        return True
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def _evict(self, keep):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            keys = [key for key in self._entries if key != keep]
+            cold = keys[:max(1, len(keys) - self.hot_entries)]
+            victim = max(cold, key=lambda key: self._entries[key][1])
+            self.discard(victim)
+            self.evictions += 1
 
     def clear(self):
-        self.cached_data.clear()
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,133 @@
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow formats are optional, .npz always works
+    pa = None
+
+METADATA_KEY = "__dbc_editor__"
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+FORMATS = ('.npz',) + ARROW_SUFFIXES + ('.parquet',)
+
+def _check_format(path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Unsupported table format {suffix or '(none)'}, use one of {', '.join(FORMATS)}")
+    if suffix != '.npz' and pa is None:
+        raise ValueError(f"{suffix} needs pyarrow, which is not installed")
+    return suffix
+
+def export_table(dataframe: pd.DataFrame, path, metadata: Optional[dict] = None):
+    """Write a table in a columnar format chosen by the file extension.
+
+    Categorical columns are stored as integer codes plus their categories,
+    every other column as its typed values. `metadata` (JSON-serializable)
+    is stored alongside and returned again by import_table.
+    """
+    suffix = _check_format(path)
+    metadata = dict(metadata or {})
+    metadata['columns'] = [str(column) for column in dataframe.columns]
+
+    if suffix == '.npz':
+        arrays = {}
+        kinds = []
+        for col_idx in range(len(dataframe.columns)):
+            series = dataframe.iloc[:, col_idx]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                kinds.append('categorical')
+                arrays[f"c{col_idx}_codes"] = series.cat.codes.to_numpy()
+                arrays[f"c{col_idx}_categories"] = series.cat.categories.to_numpy().astype(str)
+            elif series.dtype == object:
+                kinds.append('text')
+                arrays[f"c{col_idx}"] = series.fillna('').to_numpy().astype(str)
+            else:
+                kinds.append('values')
+                arrays[f"c{col_idx}"] = series.to_numpy()
+        metadata['kinds'] = kinds
+        arrays[METADATA_KEY] = np.frombuffer(json.dumps(metadata).encode('utf-8'), dtype=np.uint8)
+        # Stored uncompressed so import_table can map every member in place
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        return
+
+    table = pa.Table.from_pandas(dataframe.set_axis(metadata['columns'], axis=1), preserve_index=False)
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(metadata)})
+    if suffix == '.parquet':
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def _map_npz_member(path, info: zipfile.ZipInfo) -> np.ndarray:
+    """Memory-map an uncompressed .npy member of an .npz archive"""
+    with open(path, 'rb') as f:
+        # The local file header is 30 bytes plus the name and extra field
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+        f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            raise ValueError(f"unsupported .npy version {version}")
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError("object arrays cannot be mapped")
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+def _load_npz(path, mmap: bool) -> dict:
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        members = {info.filename[:-4]: info for info in archive.infolist() if info.filename.endswith('.npy')}
+    with np.load(path, allow_pickle=False) as npz:
+        for name, info in members.items():
+            if mmap and info.compress_type == zipfile.ZIP_STORED and name != METADATA_KEY:
+                try:
+                    arrays[name] = _map_npz_member(path, info)
+                    continue
+                except ValueError:
+                    pass
+            arrays[name] = npz[name]
+    return arrays
+
+def import_table(path, mmap: bool = True) -> Tuple[pd.DataFrame, dict]:
+    """Read a table written by export_table, memory-mapping columns where the format allows.
+
+    Mapped columns are read-only; copy a column before writing to it.
+    """
+    suffix = _check_format(path)
+
+    if suffix == '.npz':
+        arrays = _load_npz(path, mmap)
+        metadata = json.loads(bytes(arrays.pop(METADATA_KEY)).decode('utf-8'))
+        columns = {}
+        for col_idx, kind in enumerate(metadata['kinds']):
+            if kind == 'categorical':
+                columns[col_idx] = pd.Categorical.from_codes(
+                    arrays[f"c{col_idx}_codes"], categories=arrays[f"c{col_idx}_categories"].astype(object)
+                )
+            elif kind == 'text':
+                columns[col_idx] = arrays[f"c{col_idx}"].astype(object)
+            else:
+                columns[col_idx] = arrays[f"c{col_idx}"]
+        dataframe = pd.DataFrame(columns, copy=False)
+    else:
+        if suffix == '.parquet':
+            table = pq.read_table(path, memory_map=mmap)
+        else:
+            source = pa.memory_map(str(path), 'r') if mmap else pa.OSFile(str(path), 'rb')
+            table = pa.ipc.open_file(source).read_all()
+        metadata = json.loads(table.schema.metadata[METADATA_KEY.encode()].decode('utf-8'))
+        dataframe = table.to_pandas()
+
+    dataframe.columns = metadata['columns']
+    return dataframe, metadata
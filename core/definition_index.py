@@ -0,0 +1,91 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "definitions.idx"
+
+class DefinitionIndex:
+    """Compiled cache of parsed XML definition files.
+
+    The index is one pickle file holding, per definition file, its mtime and
+    size plus its parsed tables pickled as a separate blob. Opening the index
+    is a single read; a build's tables are only unpickled when asked for, and
+    a file whose mtime or size changed is re-parsed and written back. The
+    whole index is discarded when parser_version differs from the one it
+    was compiled with, so a parser change never serves stale layouts.
+    """
+
+    def __init__(self, definitions_dir, parse: Callable[[str], dict], index_path=None,
+                 parser_version: Optional[str] = None):
+        self.definitions_dir = Path(definitions_dir)
+        self.index_path = Path(index_path) if index_path else self.definitions_dir / INDEX_FILENAME
+        self._parse = parse
+        self.parser_version = parser_version
+        self._entries: Optional[Dict[str, Tuple[int, int, bytes]]] = None
+
+    def _key(self, definition_file) -> str:
+        return os.path.normcase(os.path.abspath(definition_file))
+
+    def _load_entries(self) -> Dict[str, Tuple[int, int, bytes]]:
+        """Read the index file once"""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.index_path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == INDEX_VERSION and data.get('parser') == self.parser_version:
+                    self._entries = data['files']
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Ignoring unreadable definition index {self.index_path}: {e}")
+        return self._entries
+
+    def _save(self):
+        try:
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': INDEX_VERSION, 'parser': self.parser_version, 'files': self._entries}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Warning: Could not write definition index: {e}")
+
+    def _refresh(self, definition_file) -> Optional[dict]:
+        """Re-parse a definition file if the index entry is missing or stale"""
+        key = self._key(definition_file)
+        stat = os.stat(definition_file)
+        entry = self._load_entries().get(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return None
+
+        print(f"Compiling definition file: {definition_file}")
+        tables = self._parse(definition_file)
+        self._entries[key] = (stat.st_mtime_ns, stat.st_size,
+                              pickle.dumps(tables, protocol=pickle.HIGHEST_PROTOCOL))
+        return tables
+
+    def compile_all(self, definition_files: Optional[Iterable[str]] = None):
+        """Make sure every definition file is compiled into the index"""
+        if definition_files is None:
+            definition_files = sorted(str(path) for path in self.definitions_dir.glob("*.xml"))
+
+        changed = False
+        for definition_file in definition_files:
+            changed |= self._refresh(definition_file) is not None
+        if changed:
+            self._save()
+
+    def get_tables(self, definition_file) -> dict:
+        """Get the parsed tables of a definition file (a fresh copy on every call).
+
+        A stale file is re-parsed and the index saved right away; call
+        compile_all first when reading many files, so it is saved once.
+        """
+        tables = self._refresh(definition_file)
+        if tables is not None:
+            self._save()
+            return tables
+        return pickle.loads(self._entries[self._key(definition_file)][2])
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+@dataclass
+class ChangeSet:
+    """Differences between an old and a new version of a table.
+
+    Rows are matched on `key` (row position when None). Every changed field
+    is one entry of the cell arrays, which hold the new-table row, the
+    record ID, the column (an index into `columns`) and both values.
+    """
+    key: Optional[str]
+    columns: List[str]  # Columns present in both tables, in new-table order
+    added_rows: np.ndarray  # New-table rows without a match in the old table
+    added_ids: np.ndarray
+    removed_rows: np.ndarray  # Old-table rows without a match in the new table
+    removed_ids: np.ndarray
+    cell_rows: np.ndarray
+    cell_ids: np.ndarray
+    cell_columns: np.ndarray
+    old_values: np.ndarray
+    new_values: np.ndarray
+    columns_added: List[str] = field(default_factory=list)  # Only in the new table
+    columns_removed: List[str] = field(default_factory=list)  # Only in the old table
+
+    @property
+    def changed_rows(self) -> np.ndarray:
+        """New-table rows with at least one changed field"""
+        return np.unique(self.cell_rows)
+
+    def is_empty(self) -> bool:
+        return not (len(self.added_rows) or len(self.removed_rows) or len(self.cell_rows)
+                    or self.columns_added or self.columns_removed)
+
+    def summary(self) -> str:
+        text = (f"+{len(self.added_rows)} -{len(self.removed_rows)} ~{len(self.changed_rows)} rows, "
+                f"{len(self.cell_rows)} fields changed")
+        if self.columns_added or self.columns_removed:
+            text += f", {len(self.columns_added)} columns added, {len(self.columns_removed)} removed"
+        return text
+
+    def old_value_map(self) -> dict:
+        """(new-table row, column name) -> old value of every changed field"""
+        names = np.asarray(self.columns, dtype=object)[self.cell_columns]
+        return dict(zip(zip(self.cell_rows.tolist(), names.tolist()), self.old_values))
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per added record, removed record and changed field"""
+        key = self.key or 'Row'
+        parts = [
+            pd.DataFrame({'Change': 'added', key: self.added_ids, 'Field': None, 'Old': None, 'New': None}),
+            pd.DataFrame({'Change': 'removed', key: self.removed_ids, 'Field': None, 'Old': None, 'New': None}),
+            pd.DataFrame({
+                'Change': 'changed',
+                key: self.cell_ids,
+                'Field': np.asarray(self.columns, dtype=object)[self.cell_columns],
+                'Old': self.old_values,
+                'New': self.new_values,
+            }),
+        ]
+        parts = [part for part in parts if len(part)] or parts[:1]
+        return pd.concat(parts, ignore_index=True)
+
+    def export(self, path):
+        """Write the change set as .csv or .json (one object per line)"""
+        frame = self.to_frame()
+        if Path(path).suffix.lower() == '.json':
+            frame.to_json(path, orient='records', lines=True, force_ascii=False)
+        else:
+            frame.to_csv(path, index=False)
+
+def _match(old_ids: np.ndarray, new_ids: np.ndarray):
+    """Old and new rows of the IDs in both tables; the first row of a repeated ID is the one matched"""
+    old_distinct, old_first = np.unique(old_ids, return_index=True)
+    new_distinct, new_first = np.unique(new_ids, return_index=True)
+    _, old_positions, new_positions = np.intersect1d(old_distinct, new_distinct, assume_unique=True,
+                                                     return_indices=True)
+    return old_first[old_positions], new_first[new_positions]
+
+def _unmatched(row_count: int, matched: np.ndarray) -> np.ndarray:
+    mask = np.ones(row_count, dtype=bool)
+    mask[matched] = False
+    return np.flatnonzero(mask)
+
+def _differs(old: pd.Series, new: pd.Series, old_rows: np.ndarray, new_rows: np.ndarray) -> np.ndarray:
+    """Per matched row, whether a column's value changed"""
+    old_categorical = isinstance(old.dtype, pd.CategoricalDtype)
+    new_categorical = isinstance(new.dtype, pd.CategoricalDtype)
+    if old_categorical and new_categorical:
+        # Old codes are translated into the new categories, then compared as integers
+        translate = pd.Index(new.cat.categories).get_indexer(old.cat.categories)
+        translate = np.append(np.where(translate < 0, -2, translate), -1)  # Code -1 (missing) stays -1
+        return translate[old.cat.codes.to_numpy()[old_rows]] != new.cat.codes.to_numpy()[new_rows]
+
+    if old_categorical or new_categorical or old.dtype == object or new.dtype == object:
+        old_values = old.to_numpy(dtype=object)[old_rows]
+        new_values = new.to_numpy(dtype=object)[new_rows]
+        both_missing = pd.isna(old_values) & pd.isna(new_values)
+        return (old_values != new_values) & ~both_missing
+
+    old_values = old.to_numpy()[old_rows]
+    new_values = new.to_numpy()[new_rows]
+    changed = old_values != new_values
+    if old_values.dtype.kind == 'f' or new_values.dtype.kind == 'f':
+        changed &= ~(np.isnan(old_values.astype(float)) & np.isnan(new_values.astype(float)))
+    return changed
+
+def diff_tables(old: pd.DataFrame, new: pd.DataFrame, key: Optional[str] = None) -> ChangeSet:
+    """Compare two versions of a table, matching rows on a key column (or position)"""
+    if key is not None and (key not in old.columns or key not in new.columns):
+        raise KeyError(f"{key} is not a column of both tables")
+    old_ids = old[key].to_numpy() if key else np.arange(len(old))
+    new_ids = new[key].to_numpy() if key else np.arange(len(new))
+    old_rows, new_rows = _match(old_ids, new_ids)
+
+    old_columns = set(old.columns)
+    columns = [column for column in new.columns if column in old_columns and column != key]
+    cell_rows, cell_columns, old_values, new_values = [], [], [], []
+    for col_idx, column in enumerate(columns):
+        changed = np.flatnonzero(_differs(old[column], new[column], old_rows, new_rows))
+        if len(changed) == 0:
+            continue
+        cell_rows.append(new_rows[changed])
+        cell_columns.append(np.full(len(changed), col_idx, dtype=np.int32))
+        old_values.append(old[column].iloc[old_rows[changed]].to_numpy(dtype=object))
+        new_values.append(new[column].iloc[new_rows[changed]].to_numpy(dtype=object))
+
+    def joined(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    cell_rows = joined(cell_rows, np.int64)
+    added_rows = _unmatched(len(new), new_rows)
+    removed_rows = _unmatched(len(old), old_rows)
+    new_columns = set(new.columns)
+    return ChangeSet(
+        key=key,
+        columns=columns,
+        added_rows=added_rows,
+        added_ids=new_ids[added_rows],
+        removed_rows=removed_rows,
+        removed_ids=old_ids[removed_rows],
+        cell_rows=cell_rows,
+        cell_ids=new_ids[cell_rows],
+        cell_columns=joined(cell_columns, np.int32),
+        old_values=joined(old_values, object),
+        new_values=joined(new_values, object),
+        columns_added=[column for column in new.columns if column not in old_columns],
+        columns_removed=[column for column in old.columns if column not in new_columns],
+    )
@@ -0,0 +1,43 @@
+import numpy as np
+from typing import Dict, List
+
+class DirtyTracker:
+    """Records which (row, column) cells changed since the last load or save.
+
+    Rows are kept per column as arrays, so bulk edits mark whole selections
+    at once. Inserting or deleting rows shifts every record after it, which
+    is tracked separately as a structural change.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, List[np.ndarray]] = {}
+        self.structure_changed = False
+
+    def mark(self, rows, col_idx: int):
+        """Mark one row position or an array of them as changed in a column"""
+        self._rows.setdefault(col_idx, []).append(np.atleast_1d(np.asarray(rows, dtype=np.int64)))
+
+    def mark_structure(self):
+        self.structure_changed = True
+
+    def clear(self):
+        self._rows = {}
+        self.structure_changed = False
+
+    def is_dirty(self) -> bool:
+        return self.structure_changed or bool(self._rows)
+
+    def columns(self) -> List[int]:
+        return sorted(self._rows)
+
+    def rows(self, col_idx: int) -> np.ndarray:
+        """Sorted distinct changed rows of a column"""
+        parts = self._rows.get(col_idx)
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.unique(np.concatenate(parts))
+        self._rows[col_idx] = [rows]  # Keep the merged form for the next call
+        return rows
+
+    def cell_count(self) -> int:
+        return sum(len(self.rows(col_idx)) for col_idx in self.columns())
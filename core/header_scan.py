@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from dbc.dbc_format import DBCHeader
+
+POOL_THRESHOLD = 512  # Below this many files starting worker processes costs more than it saves
+CHUNK_SIZE = 64
+
+@dataclass
+class ScanResult:
+    path: str
+    size: int
+    header: Optional[DBCHeader] = None
+    error: Optional[str] = None
+
+    @property
+    def expected_size(self) -> Optional[int]:
+        if self.header is None:
+            return None
+        return 20 + self.header.record_count * self.header.record_size + self.header.string_block_size
+
+def find_dbc_files(folder: str, recursive: bool = False) -> List[str]:
+    """DBC files in a folder, optionally including subfolders"""
+    candidates = Path(folder).rglob("*") if recursive else Path(folder).iterdir()
+    return sorted(str(path) for path in candidates if path.suffix.lower() == '.dbc' and path.is_file())
+
+def scan_file(path: str) -> ScanResult:
+    """Read the header of one file without touching its records"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(20)
+            size = os.fstat(f.fileno()).st_size
+    except OSError as e:
+        return ScanResult(path, 0, error=str(e))
+
+    try:
+        result = ScanResult(path, size, DBCHeader.read(data))
+    except ValueError as e:
+        return ScanResult(path, size, error=str(e))
+    if result.expected_size != size:
+        result.error = f"size mismatch: header says {result.expected_size} bytes"
+    return result
+
+def _scan_chunk(paths: List[str]) -> List[ScanResult]:
+    return [scan_file(path) for path in paths]
+
+def scan_headers(paths: Iterable[str], workers: Optional[int] = None) -> List[ScanResult]:
+    """Read the headers of many files, fanning out over a process pool for large sets"""
+    paths = list(paths)
+    if len(paths) < POOL_THRESHOLD:
+        return _scan_chunk(paths)
+
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [result for chunk in executor.map(_scan_chunk, chunks) for result in chunk]
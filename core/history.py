@@ -0,0 +1,94 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def _array_bytes(values: np.ndarray) -> int:
+    if values.dtype == object:
+        return int(pd.Series(values).memory_usage(deep=True, index=False))
+    return values.nbytes
+
+@dataclass
+class CellChange:
+    """Values of one column changed at some rows, from a single cell edit or a bulk edit"""
+    col_idx: int
+    rows: np.ndarray
+    old_values: np.ndarray
+    new_values: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + _array_bytes(self.old_values) + _array_bytes(self.new_values)
+
+@dataclass
+class RowChange:
+    """Rows inserted into or deleted from the table, with their values (strings decoded)"""
+    inserted: bool
+    rows: np.ndarray  # Sorted positions of the rows in the table that holds them
+    records: pd.DataFrame
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + int(self.records.memory_usage(deep=True, index=False).sum())
+
+Change = Union[CellChange, RowChange]
+
+class EditHistory:
+    """Undo and redo stacks of table edits.
+
+    Each entry holds only the rows it touched, so undoing and redoing costs
+    as much as the edit itself. Once the entries together pass max_bytes the
+    oldest ones are forgotten; an edit larger than the whole budget can't be
+    undone.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._undo: Deque[Tuple[Change, int]] = deque()  # (edit, its size), oldest first
+        self._redo: Deque[Tuple[Change, int]] = deque()
+        self.total_bytes = 0  # Of both stacks
+
+    def record(self, change: Change) -> bool:
+        """Add an edit that was just made; returns whether it can be undone"""
+        self.total_bytes -= sum(size for _, size in self._redo)
+        self._redo.clear()
+        entry = (change, change.nbytes)
+        self._undo.append(entry)
+        self.total_bytes += entry[1]
+        while self.total_bytes > self.max_bytes and self._undo:
+            self.total_bytes -= self._undo.popleft()[1]
+        return bool(self._undo) and self._undo[-1] is entry
+
+    def undo(self) -> Optional[Change]:
+        """The edit to revert, moved onto the redo stack"""
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._redo.append(entry)
+        return entry[0]
+
+    def redo(self) -> Optional[Change]:
+        """The edit to make again, moved back onto the undo stack"""
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(entry)
+        return entry[0]
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> dict:
+        return {'undo': len(self._undo), 'redo': len(self._redo), 'bytes': self.total_bytes}
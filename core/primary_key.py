@@ -0,0 +1,57 @@
+import numpy as np
+from typing import Dict, Optional
+
+class PrimaryKeyIndex:
+    """ID to row position lookup for a table's IsIndex column.
+
+    Built from the column in one pass at load time and patched on edits.
+    Appending a row is a single insert; inserting or deleting in the middle
+    shifts row positions, so the caller rebuilds from the column instead.
+    When an ID occurs more than once the first row holding it wins.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, int] = {}
+        self.duplicates = 0
+
+    def build(self, ids: np.ndarray):
+        ids = ids.tolist()
+        # Reversed so the first occurrence of a duplicated ID is the one kept
+        self._rows = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+        self.duplicates = len(ids) - len(self._rows)
+        if self.duplicates:
+            print(f"Warning: {self.duplicates} rows share an ID with an earlier row")
+
+    def clear(self):
+        self._rows = {}
+        self.duplicates = 0
+
+    def get(self, record_id: int) -> Optional[int]:
+        return self._rows.get(record_id)
+
+    def __contains__(self, record_id) -> bool:
+        return record_id in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def update(self, row_idx: int, old_id: int, new_id: int):
+        """Move one row from its old ID to a new one"""
+        if self._rows.get(old_id) == row_idx:
+            del self._rows[old_id]
+        if new_id in self._rows and self._rows[new_id] != row_idx:
+            print(f"Warning: ID {new_id} is already used by row {self._rows[new_id]}")
+            self.duplicates += 1
+            return
+        self._rows[new_id] = row_idx
+
+    def append(self, row_idx: int, record_id: int):
+        """Register a row added at the end of the table"""
+        if record_id in self._rows:
+            print(f"Warning: ID {record_id} is already used by row {self._rows[record_id]}")
+            self.duplicates += 1
+            return
+        self._rows[record_id] = row_idx
+
+    def next_id(self) -> int:
+        return max(self._rows, default=0) + 1
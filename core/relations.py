@@ -0,0 +1,210 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NON_KEY_TYPES = ('string', 'loc', 'float', 'bool', 'long', 'ulong')
+ID_SUFFIX = re.compile(r'_?(ID|Id)$')
+ARRAY_SUFFIX = re.compile(r'_\d+$')
+DISPLAY_PREFIXES = ('Name', 'Title', 'Description', 'Text')  # Preferred label columns of a referenced table
+MIN_SUFFIX_MATCH = 4  # Shortest field name matched against the end of a table name
+
+@dataclass
+class Relation:
+    column: str  # Referencing column of the source table
+    table: str  # Referenced table
+    key: str  # Referenced table's ID column
+
+def _key_field(fields) -> Optional[str]:
+    """Name of a table's ID column: its IsIndex field, else a field called ID"""
+    for field in fields:
+        if field.get('is_index'):
+            return field['name']
+    return next((field['name'] for field in fields if field['name'] == 'ID'), None)
+
+def table_names(definitions: dict) -> Dict[str, str]:
+    """Lowercase to original table names of a definition build (which lists both spellings)"""
+    names = {}
+    for name in definitions:
+        if name != name.lower() or name not in names:
+            names[name.lower()] = name
+    return names
+
+def infer_relations(table_name: str, columns: List[str], column_types: List[str],
+                    definitions: dict) -> Dict[str, Relation]:
+    """Foreign keys of a table guessed from its column names.
+
+    A column `Category` of `Achievement` points at `Achievement_Category`,
+    `Map` or `MapID` at `Map`, and `IconId` at the one table whose name ends
+    in `Icon` (SpellIcon). Array slots (`Reagent_3`) share their field's
+    target. Only targets with an ID column in the same build are kept.
+    """
+    names = table_names(definitions)
+    relations = {}
+    for column, column_type in zip(columns, column_types):
+        if column_type in NON_KEY_TYPES or column == 'ID':
+            continue
+        field = ARRAY_SUFFIX.sub('', column)
+        base = ID_SUFFIX.sub('', field) or field
+        candidates = [f"{table_name}_{base}", f"{table_name}{base}", base, field]
+        if len(base) >= MIN_SUFFIX_MATCH:
+            ending = [name for name in names if name.endswith(base.lower())]
+            if len(ending) == 1:
+                candidates.append(ending[0])
+        for candidate in candidates:
+            target = names.get(candidate.lower())
+            if target is None or target.lower() == table_name.lower():
+                continue
+            key = _key_field(definitions[target])
+            if key is not None:
+                relations[column] = Relation(column, target, key)
+                break
+    return relations
+
+class RelatedTable:
+    """A referenced table with an ID -> row lookup built for vectorized joins"""
+
+    def __init__(self, handler, key: str):
+        self.handler = handler
+        self.key = key
+        self.file_state = handler._loaded_file
+        ids = handler.dataframe[key].to_numpy()
+        # The first row holding an ID wins, as in the primary key index
+        distinct, first_rows = np.unique(ids, return_index=True)
+        self.ids = pd.Index(distinct)
+        self.first_rows = first_rows
+
+    def rows_of(self, ids: np.ndarray) -> np.ndarray:
+        """Row of each ID in the referenced table, -1 where it has no such record"""
+        positions = self.ids.get_indexer(ids)
+        return np.where(positions >= 0, self.first_rows[positions], -1)
+
+    def display_column(self) -> Optional[str]:
+        """The column that best names a record: a Name/Title text column in the shown locale"""
+        handler = self.handler
+        shown = handler.get_display_columns()
+        text_columns = [
+            handler.dataframe.columns[col_idx] for col_idx in shown
+            if handler.dbc_file.column_types[col_idx] in ('string', 'loc')
+        ]
+        for prefix in DISPLAY_PREFIXES:
+            for column in text_columns:
+                if column.startswith(prefix):
+                    return column
+        return text_columns[0] if text_columns else None
+
+    def column(self, name: str) -> pd.Series:
+        """A column of the referenced table with its strings decoded"""
+        col_idx = self.handler.dataframe.columns.get_loc(name)
+        self.handler.resolve_string_column(col_idx)
+        return self.handler.dataframe.iloc[:, col_idx]
+
+class RelationResolver:
+    """Joins columns of the loaded table to the tables their IDs point at.
+
+    Referenced tables are loaded on first use, from the same folder and with
+    the same definition build, by `open_table(table name)`, and are kept
+    until the folder or build changes. A join maps a whole column of IDs to
+    referenced rows with one index lookup and gathers the wanted column.
+    """
+
+    def __init__(self, handler, open_table: Callable[[str], Optional[object]]):
+        self.handler = handler
+        self._open_table = open_table
+        self._relations: Dict[tuple, Dict[str, Relation]] = {}
+        self._tables: Dict[str, Optional[RelatedTable]] = {}
+        self._scope = None  # (folder, definition file) the loaded related tables belong to
+
+    def relations(self) -> Dict[str, Relation]:
+        """Relations of the loaded table, by referencing column"""
+        handler = self.handler
+        if handler.dataframe is None:
+            return {}
+        columns = [str(column) for column in handler.dataframe.columns]
+        key = (handler.current_table_name, handler.definition_handler.current_definition_file, tuple(columns))
+        relations = self._relations.get(key)
+        if relations is None:
+            relations = self._relations[key] = infer_relations(
+                handler.current_table_name, columns, list(handler.dbc_file.column_types),
+                handler.definition_handler.definitions
+            )
+        return relations
+
+    def _check_scope(self):
+        loaded_file = self.handler._loaded_file
+        scope = (os.path.dirname(loaded_file[0]) if loaded_file else None,
+                 self.handler.definition_handler.current_definition_file)
+        if scope != self._scope:
+            self._tables = {}
+            self._scope = scope
+
+    def table(self, relation: Relation) -> Optional[RelatedTable]:
+        """The referenced table of a relation, loaded on first use"""
+        self._check_scope()
+        name = relation.table.lower()
+        if name in self._tables:
+            related = self._tables[name]
+            # Reloaded only when the file changed on disk; a missing table is not retried
+            if related is None or related.file_state == related.handler._file_state(related.file_state[0]):
+                if related is not None:
+                    related.handler.locale = self.handler.locale
+                return related
+        handler = self._open_table(relation.table)
+        related = self._tables[name] = RelatedTable(handler, relation.key) if handler is not None else None
+        return related
+
+    def split(self, path: str) -> Tuple[Relation, str]:
+        """Relation and referenced column of a `Column.TargetColumn` path"""
+        column, _, target_column = path.partition('.')
+        relation = self.relations().get(column)
+        if relation is None:
+            raise KeyError(f"{column} does not reference another table")
+        return relation, target_column
+
+    def resolve(self, path: str, rows=slice(None)) -> pd.Series:
+        """Values of `Column.TargetColumn` for the given rows, missing where the ID has no record.
+
+        The target column defaults to the referenced table's name column.
+        """
+        relation, target_column = self.split(path)
+        related = self.table(relation)
+        if related is None:
+            raise KeyError(f"{relation.table} is not available")
+        target_column = target_column or related.display_column()
+        if target_column is None:
+            raise KeyError(f"{relation.table} has no column to show")
+
+        ids = self.handler.dataframe[relation.column].iloc[rows].to_numpy()
+        target_rows = related.rows_of(ids)
+        found = target_rows >= 0
+        values = related.column(target_column).iloc[np.where(found, target_rows, 0)].reset_index(drop=True)
+        return values.where(found).rename(f"{relation.column}.{target_column}")
+
+    def find_rows(self, path: str, value: str) -> np.ndarray:
+        """Rows whose referenced record matches a search on `Column.TargetColumn`"""
+        relation, target_column = self.split(path)
+        related = self.table(relation)
+        if related is None:
+            return np.empty(0, dtype=np.int64)
+        target_column = target_column or related.display_column()
+        # Searched in the referenced table's own index, then joined back by ID
+        target_rows = related.handler.find_rows(target_column, value)
+        ids = related.handler.dataframe[relation.key].to_numpy()[target_rows]
+        return np.flatnonzero(np.isin(self.handler.dataframe[relation.column].to_numpy(), ids))
+
+    def labels(self, rows, columns) -> Dict[int, pd.Series]:
+        """Names of the referenced records for the relation columns among the given positions"""
+        relations = self.relations()
+        labels = {}
+        for col_idx in columns:
+            column = str(self.handler.dataframe.columns[col_idx])
+            if column not in relations:
+                continue
+            try:
+                labels[col_idx] = self.resolve(column, rows)
+            except KeyError:
+                continue
+        return labels
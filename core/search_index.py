@@ -0,0 +1,128 @@
+import weakref
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+NGRAM = 3
+
+class ColumnIndex:
+    """Search index over one DataFrame column.
+
+    Rows are kept in a stable argsort order, so every distinct value owns a
+    contiguous run of row positions. Numeric equality and range queries are
+    binary searches on the sorted values; substring queries run over the
+    distinct values only, narrowed by a trigram index, and the matching runs
+    are then gathered into row positions.
+    """
+
+    def __init__(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            self.numeric = False
+            self.order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[self.order]
+            # Missing values (code -1) sort first and belong to no distinct value
+            self.starts = np.searchsorted(sorted_codes, np.arange(len(series.cat.categories)), side='left')
+            self.ends = np.searchsorted(sorted_codes, np.arange(len(series.cat.categories)), side='right')
+            self.distinct = series.cat.categories.to_numpy()
+            self.sorted_values = None
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            values = series.to_numpy()
+            self.numeric = True
+            self.order = np.argsort(values, kind='stable')
+            self.sorted_values = values[self.order]
+            self.distinct, self.starts = np.unique(self.sorted_values, return_index=True)
+            self.ends = np.append(self.starts[1:], len(self.sorted_values))
+        else:
+            codes, uniques = pd.factorize(series, sort=False)
+            self.numeric = False
+            self.order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[self.order]
+            self.starts = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='left')
+            self.ends = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='right')
+            self.distinct = np.asarray(uniques, dtype=object)
+            self.sorted_values = None
+
+        self._labels: Optional[List[str]] = None
+        self._ngrams: Optional[Dict[str, np.ndarray]] = None
+
+    def _build_text_index(self):
+        """Lower-cased labels of the distinct values and their trigram postings"""
+        self._labels = [str(value).lower() for value in self.distinct]
+        postings: Dict[str, list] = {}
+        for value_id, label in enumerate(self._labels):
+            for gram in {label[i:i + NGRAM] for i in range(len(label) - NGRAM + 1)}:
+                postings.setdefault(gram, []).append(value_id)
+        self._ngrams = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def _rows_for(self, value_ids) -> np.ndarray:
+        """Row positions, in table order, holding any of the given distinct values"""
+        if len(value_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(value_ids) <= 64:
+            runs = [self.order[self.starts[value_id]:self.ends[value_id]] for value_id in value_ids]
+            return np.sort(np.concatenate(runs))
+        # Many values: expand a per-value mask over the runs they own in sorted order
+        selected = np.zeros(len(self.distinct), dtype=bool)
+        selected[np.asarray(value_ids)] = True
+        in_sorted = np.zeros(len(self.order), dtype=bool)
+        in_sorted[self.starts[0]:self.ends[-1]] = np.repeat(selected, self.ends - self.starts)
+        return np.sort(self.order[in_sorted])
+
+    def contains(self, text: str) -> np.ndarray:
+        """Rows whose value contains the text, ignoring case"""
+        if self._labels is None:
+            self._build_text_index()
+        text = text.lower()
+        if len(text) < NGRAM:
+            candidates = range(len(self._labels))
+        else:
+            grams = {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+            posting_lists = sorted((self._ngrams.get(gram) for gram in grams),
+                                   key=lambda ids: -1 if ids is None else len(ids))
+            if posting_lists[0] is None:
+                return np.empty(0, dtype=np.int64)
+            candidates = posting_lists[0]
+            for ids in posting_lists[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        matches = [value_id for value_id in candidates if text in self._labels[value_id]]
+        return self._rows_for(matches)
+
+    def equals(self, value) -> np.ndarray:
+        """Rows equal to a value"""
+        if self.numeric:
+            return self.between(value, value)
+        matches = np.flatnonzero(self.distinct == value)
+        return self._rows_for(matches)
+
+    def between(self, low=None, high=None) -> np.ndarray:
+        """Rows with low <= value <= high on a numeric column"""
+        if not self.numeric:
+            raise TypeError("Range queries need a numeric column")
+        start = 0 if low is None else np.searchsorted(self.sorted_values, low, side='left')
+        end = len(self.sorted_values) if high is None else np.searchsorted(self.sorted_values, high, side='right')
+        return np.sort(self.order[start:end])
+
+class SearchIndex:
+    """Lazily built ColumnIndex per column of a DataFrame, dropped on edit"""
+
+    def __init__(self):
+        self._columns: Dict[int, ColumnIndex] = {}
+        self._dataframe = None  # Weak reference to the DataFrame the indexes describe
+
+    def get(self, dataframe: pd.DataFrame, col_idx: int) -> ColumnIndex:
+        if self._dataframe is None or self._dataframe() is not dataframe:
+            # Another table was loaded, nothing cached applies to it
+            self._columns.clear()
+            self._dataframe = weakref.ref(dataframe)
+        index = self._columns.get(col_idx)
+        if index is None:
+            index = self._columns[col_idx] = ColumnIndex(dataframe.iloc[:, col_idx])
+        return index
+
+    def invalidate(self, col_idx: Optional[int] = None):
+        """Forget one column's index, or every index"""
+        if col_idx is None:
+            self._columns.clear()
+        else:
+            self._columns.pop(col_idx, None)
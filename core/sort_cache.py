@@ -0,0 +1,66 @@
+import weakref
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence, Tuple
+
+def sort_keys(series: pd.Series) -> np.ndarray:
+    """Values that order a column's rows; missing values sort last"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        # Rank of each category in sorted text order, codes are in insertion order
+        ranks = np.empty(len(categories) + 1, dtype=np.int64)
+        ranks[np.argsort(categories.to_numpy().astype(str), kind='stable')] = np.arange(len(categories))
+        ranks[-1] = len(categories)  # Code -1 (missing) indexes the last slot
+        return ranks[series.cat.codes.to_numpy()]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy()
+    return pd.factorize(series.astype(str), sort=True)[0]
+
+def dense_ranks(keys: np.ndarray, ascending: bool) -> np.ndarray:
+    """Dense ranks of sort keys, reversed for descending order so lexsort stays stable"""
+    ranks = np.unique(keys, return_inverse=True)[1].reshape(-1)
+    return ranks if ascending else ranks.max(initial=0) - ranks
+
+class SortCache:
+    """Argsort permutations of a DataFrame, cached per (columns, directions).
+
+    Multi-key sorts use np.lexsort, which is stable, so rows that tie on
+    every key keep their table order. Editing a column only drops the
+    permutations that sort by it.
+    """
+
+    def __init__(self):
+        self._orders: Dict[Tuple[Tuple[int, ...], Tuple[bool, ...]], np.ndarray] = {}
+        self._dataframe = None  # Weak reference to the DataFrame the permutations describe
+
+    def get(self, dataframe: pd.DataFrame, columns: Sequence[int],
+            ascending: Optional[Sequence[bool]] = None) -> np.ndarray:
+        if self._dataframe is None or self._dataframe() is not dataframe:
+            # Another table was loaded, nothing cached applies to it
+            self._orders.clear()
+            self._dataframe = weakref.ref(dataframe)
+
+        columns = tuple(columns)
+        ascending = tuple(ascending) if ascending is not None else (True,) * len(columns)
+        key = (columns, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            if len(columns) == 1 and ascending[0]:
+                order = np.argsort(sort_keys(dataframe.iloc[:, columns[0]]), kind='stable')
+            else:
+                # lexsort sorts by its last key first
+                order = np.lexsort([
+                    dense_ranks(sort_keys(dataframe.iloc[:, col_idx]), direction)
+                    for col_idx, direction in reversed(list(zip(columns, ascending)))
+                ])
+            order.flags.writeable = False  # Shared by every caller
+            self._orders[key] = order
+        return order
+
+    def invalidate(self, col_idx: Optional[int] = None):
+        """Drop the permutations that sort by a column, or all of them"""
+        if col_idx is None:
+            self._orders.clear()
+            return
+        for key in [key for key in self._orders if col_idx in key[0]]:
+            del self._orders[key]
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from core import columnar
+
+CACHE_VERSION = 3  # Bump when the stored form of a table changes
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def user_cache_dir() -> Path:
+    """The platform's per-user cache folder for the editor"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / "AppData" / "Local"
+    elif sys.platform == 'darwin':
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache"
+    return Path(base) / "dbc-editor"
+
+DEFAULT_CACHE_DIR = user_cache_dir() / "TableCache"
+
+class TableCache:
+    """Parsed tables kept on disk as uncompressed .npz files.
+
+    An entry is keyed by the DBC file's content hash, the definition build
+    and the table layout it was decoded with, so a renamed or copied file
+    still hits and an edited file or a different build misses. Entries are
+    memory-mapped on a hit; reading one refreshes its mtime, and the least
+    recently used entries are deleted once the folder grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._hashes: Dict[Tuple[str, int, int], str] = {}  # (path, mtime, size) -> content hash
+
+    def content_hash(self, filepath: str) -> str:
+        """Hash of a file's bytes, remembered while its mtime and size stay the same"""
+        stat = os.stat(filepath)
+        state = (os.path.normcase(os.path.abspath(filepath)), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(state)
+        if digest is None:
+            hasher = hashlib.sha256()  # Hardware accelerated on most CPUs, about twice blake2b's speed
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()[:32]
+            self._hashes[state] = digest
+        return digest
+
+    def key(self, filepath: str, definition: Optional[str], layout) -> str:
+        """Entry name for a file decoded with a definition build and layout"""
+        parts = json.dumps([CACHE_VERSION, self.content_hash(filepath), definition, layout],
+                           sort_keys=True, default=str)
+        return hashlib.blake2b(parts.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, dict]]:
+        """Map a cached table, or None on a miss"""
+        path = self._entry_path(key)
+        if not path.exists():
+            return None
+        try:
+            dataframe, metadata = columnar.import_table(path, mmap=True)
+            os.utime(path)  # Most recently used
+        except Exception as e:
+            print(f"Ignoring unreadable cache entry {path.name}: {e}")
+            return None
+        return dataframe, metadata
+
+    def put(self, key: str, dataframe: pd.DataFrame, metadata: dict) -> bool:
+        """Store a table, then prune the cache back under its size cap"""
+        path = self._entry_path(key)
+        # Written outside the cache folder first so a half-written entry is never mapped
+        tmp_path = self.cache_dir / "tmp" / path.name
+        try:
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            columnar.export_table(dataframe, tmp_path, metadata)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not write table cache entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        self.prune(keep=path)
+        return True
+
+    def size(self) -> int:
+        """Total bytes of all entries"""
+        return sum(path.stat().st_size for path in self.cache_dir.glob("*.npz"))
+
+    def prune(self, keep: Optional[Path] = None):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        try:
+            entries = [(path.stat(), path) for path in self.cache_dir.glob("*.npz")]
+        except OSError:
+            return
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime_ns):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+                total -= stat.st_size
+            except OSError:
+                pass  # Still mapped by an open table (Windows), try again next time
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.npz"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._hashes = {}
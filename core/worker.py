@@ -0,0 +1,143 @@
+import queue
+import threading
+import traceback
+from collections import deque
+from typing import Any, Callable, Optional
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+class Job:
+    """One unit of background work.
+
+    `func(job)` runs on the worker thread and may call `job.report()` to
+    publish progress; `report` raises JobCancelled once the job is cancelled.
+    `on_progress(job, fraction, message)` and `on_done(job, result, error)`
+    run on the thread that calls `BackgroundWorker.poll()`.
+    """
+
+    def __init__(self, key: str, func: Callable[['Job'], Any], on_done=None, on_progress=None,
+                 cancellable: bool = True, label: str = ""):
+        self.key = key
+        self.func = func
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.cancellable = cancellable
+        self.label = label
+        self.state = "pending"  # pending, running, done, failed or cancelled
+        self._cancel_event = threading.Event()
+        self._worker = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> bool:
+        if not self.cancellable:
+            return False
+        self._cancel_event.set()
+        return True
+
+    def report(self, fraction: float, message: Optional[str] = None):
+        """Publish progress from the worker thread"""
+        if self.cancelled:
+            raise JobCancelled()
+        if self._worker is not None:
+            self._worker._events.put(("progress", self, (fraction, message)))
+
+class BackgroundWorker:
+    """Single worker thread running jobs one at a time.
+
+    Submitting a job replaces any pending job with the same key, and cancels
+    the running one if it shares the key, so only the latest request of a
+    kind is carried out. Results are handed back through `poll()`, which the
+    GUI calls every frame so callbacks never touch widgets from the worker.
+    """
+
+    def __init__(self):
+        self._pending = deque()
+        self._events = queue.SimpleQueue()
+        self._condition = threading.Condition()
+        self._running = True
+        self.current: Optional[Job] = None
+        self._thread = threading.Thread(target=self._run, name="dbc-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Job) -> Job:
+        with self._condition:
+            for pending in [p for p in self._pending if p.key == job.key]:
+                self._pending.remove(pending)
+                pending.state = "cancelled"
+                self._events.put(("done", pending, None))
+            if self.current is not None and self.current.key == job.key:
+                self.current.cancel()
+            job._worker = self
+            self._pending.append(job)
+            self._condition.notify()
+        return job
+
+    def cancel(self, key: Optional[str] = None):
+        """Cancel the running job and drop pending ones (of one key if given)"""
+        with self._condition:
+            for pending in [p for p in self._pending if key is None or p.key == key]:
+                if pending.cancellable:
+                    self._pending.remove(pending)
+                    pending.state = "cancelled"
+                    self._events.put(("done", pending, None))
+            if self.current is not None and (key is None or self.current.key == key):
+                self.current.cancel()
+
+    def is_busy(self) -> bool:
+        with self._condition:
+            return self.current is not None or bool(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._pending:
+                    return  # Shut down, non-cancellable work such as saves still finishes
+                job = self.current = self._pending.popleft()
+                job.state = "running"
+
+            result, error = None, None
+            try:
+                result = job.func(job)
+                job.state = "cancelled" if job.cancelled else "done"
+            except JobCancelled:
+                job.state = "cancelled"
+            except Exception as e:
+                traceback.print_exc()
+                job.state = "failed"
+                error = e
+
+            with self._condition:
+                self.current = None
+            self._events.put(("done", job, (result, error)))
+
+    def poll(self):
+        """Deliver progress and completion callbacks on the calling thread"""
+        while True:
+            try:
+                kind, job, payload = self._events.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if kind == "progress":
+                    if job.on_progress and not job.cancelled:
+                        job.on_progress(job, *payload)
+                elif job.on_done:
+                    result, error = payload if payload else (None, None)
+                    job.on_done(job, result, error)
+            except Exception as e:
+                print(f"Error in {job.label or job.key} callback: {e}")
+                traceback.print_exc()
+
+    def shutdown(self):
+        """Stop the worker after cancelling outstanding cancellable work"""
+        self.cancel()
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join(timeout=5)
@@ -1,8 +1,27 @@
 import struct
 from dataclasses import dataclass
-from typing import List, Any, Dict
+from typing import List, Dict, Optional, Tuple
 import os
+import sys
+import mmap
 import shutil
+import numpy as np
+
+# Little-endian storage type of each definition field type inside a WDBC record
+FIELD_DTYPES = {
+    'int': '<i4',
+    'uint': '<u4',
+    'float': '<f4',
+    'string': '<u4',  # Offset into the string block
+    'loc': '<u4',
+    'bool': 'u1',
+    'byte': 'u1',
+    'sbyte': 'i1',
+    'short': '<i2',
+    'ushort': '<u2',
+    'long': '<i8',
+    'ulong': '<u8',
+}
 
 @dataclass
 class DBCHeader:
@@ -34,17 +53,79 @@ class DBCHeader:
         except struct.error as e:
             raise ValueError(f"Failed to unpack DBC header: {str(e)}")
 
+def read_header(filepath: str) -> Optional[DBCHeader]:
+    """Read only the 20-byte header of a DBC file"""
+    try:
+        with open(filepath, 'rb') as f:
+            return DBCHeader.read(f.read(20))
+    except (IOError, ValueError) as e:
+        print(f"Could not read DBC header of {filepath}: {str(e)}")
+        return None
+
+def field_layout(field_types: List[str]) -> np.dtype:
+    """Build the packed structured dtype of a record from definition field types"""
+    return np.dtype({
+        'names': [f"f{i}" for i in range(len(field_types))],
+        'formats': [FIELD_DTYPES.get(field_type, '<u4') for field_type in field_types]
+    })
+
+def record_dtype(header: DBCHeader, field_types: Optional[List[str]] = None) -> np.dtype:
+    """Build the structured dtype of a single record.
+
+    The definition's field types are used when their packed size matches the
+    header's record size. Otherwise the record is read as uint32 fields, which
+    is how every WDBC field is stored unless the definition says otherwise.
+    """
+    if field_types:
+        dtype = field_layout(field_types)
+        if dtype.itemsize == header.record_size:
+            return dtype
+        print(f"Definition layout is {dtype.itemsize} bytes, record size is {header.record_size}, "
+              f"falling back to uint32 fields")
+
+    field_count = header.field_count
+    if field_count * 4 > header.record_size:
+        field_count = header.record_size // 4
+    return np.dtype({
+        'names': [f"f{i}" for i in range(field_count)],
+        'formats': ['<u4'] * field_count,
+        'itemsize': header.record_size
+    })
+
+def check_range(values: np.ndarray, dtype: np.dtype, column: str):
+    """Raise ValueError if an integer field can't store every value as it is"""
+    if dtype.kind not in 'iu' or not len(values) or values.dtype.kind not in 'biuf':
+        return
+    if values.dtype.kind == 'f':
+        bad = ~np.isfinite(values) | (values != np.round(values))
+        if bad.any():
+            raise ValueError(f"{column} holds whole numbers, got {values[bad][0]}")
+    limits = np.iinfo(dtype)
+    low, high = values.min(), values.max()
+    if low < limits.min or high > limits.max:
+        value = low if low < limits.min else high
+        raise ValueError(f"{column} value {value} is outside {limits.min}..{limits.max} of its {dtype.name} field")
+
 class DBCFile:
     def __init__(self):
         self.header: DBCHeader = None
-        self.records: List[Dict[str, Any]] = []
-        self.string_block: bytes = b''
+        self.records: Optional[np.ndarray] = None  # Structured array, one element per record
+        self.string_block: bytes = b''  # Also resets the offset -> str cache
         self.column_types: List[str] = []  # Types like 'uint32', 'string', etc
         self.column_names: List[str] = []  # Names for each column
         self.string_offsets: Dict[str, int] = {}  # Initialize string_offsets
+        self.edited_columns: Dict[int, np.ndarray] = {}  # Private copies of edited mapped fields
+        self.record_layout: Optional[np.dtype] = None  # Record dtype the file was decoded with
+        self._mmap: Optional[mmap.mmap] = None
+
+    def load_file(self, filepath: str, field_types: Optional[List[str]] = None,
+                  use_mmap: bool = False) -> bool:
+        """Load and parse a DBC file, decoding all records in one pass.
 
-    def load_file(self, filepath: str) -> bool:
-        """Load and parse a DBC file"""
+        With use_mmap the records stay in a read-only mapping of the file and
+        are only paged in when accessed; see get_column and edit_column.
+        """
+        self.close()
         try:
             with open(filepath, 'rb') as f:
                 # Read and validate header
@@ -73,34 +154,32 @@ class DBCFile:
                     print(f"File size mismatch: expected {expected_size}, got {actual_size}")
                     return False
 
-                # Read record data
-                f.seek(20)  # Reset to after header
-                record_data = f.read(self.header.record_count * self.header.record_size)
-
-                # Parse records
-                self.records = []
-                offset = 0
-                for _ in range(self.header.record_count):
-                    if offset + self.header.record_size > len(record_data):
-                        break
-
-                    record = {}
-                    for field_idx in range(self.header.field_count):
-                        field_offset = offset + (field_idx * 4)
-                        if field_offset + 4 <= len(record_data):
-                            try:
-                                value = struct.unpack('<I', record_data[field_offset:field_offset + 4])[0]
-                                record[field_idx] = value
-                            except struct.error:
-                                print(f"Error unpacking field {field_idx} at offset {field_offset}")
-                                continue
-
-                    if record:
-                        self.records.append(record)
-                    offset += self.header.record_size
-
-                # Read string block
-                self.string_block = f.read(self.header.string_block_size)
+                dtype = record_dtype(self.header, field_types)
+                self.record_layout = dtype
+                data_size = self.header.record_count * self.header.record_size
+
+                if use_mmap:
+                    # Records are views over the mapping, nothing is copied here
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.records = np.frombuffer(
+                        self._mmap,
+                        dtype=dtype,
+                        count=self.header.record_count,
+                        offset=20
+                    )
+                    self.string_block = self._mmap[20 + data_size:]
+                else:
+                    # Read record data and decode it as one structured array
+                    f.seek(20)  # Reset to after header
+                    record_data = f.read(data_size)
+                    self.records = np.frombuffer(
+                        record_data,
+                        dtype=dtype,
+                        count=self.header.record_count
+                    )
+
+                    # Read string block
+                    self.string_block = f.read(self.header.string_block_size)
 
                 print(f"Successfully loaded {len(self.records)} records")
                 return True
@@ -112,25 +191,52 @@ class DBCFile:
             print(f"Unexpected error: {str(e)}")
             return False
 
+    def close(self):
+        """Release the memory mapping of a file opened with use_mmap"""
+        self.edited_columns = {}
+        if self._mmap is None:
+            return
+        self.records = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views handed out to DataFrames are still alive, the mapping is
+            # released once the last of them is garbage collected
+            pass
+        self._mmap = None
+
+    @property
+    def string_block(self) -> bytes:
+        return self._string_block
+
+    @string_block.setter
+    def string_block(self, block: bytes):
+        self._string_block = block
+        self._string_cache: Dict[int, str] = {}  # Offsets are only valid for this block
+        self._string_lookup: Dict[str, int] = {}
+        self._string_index = None  # See _block_strings
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mmap is not None
+
     def save_file(self, filepath: str) -> bool:
         """Save DBC file with current records"""
         try:
+            records = np.ascontiguousarray(self.records)
+            field_count = self.header.field_count if self.header else len(records.dtype.names)
+
             with open(filepath, 'wb') as f:
                 # Write header
-                f.write(b'WDBC')
-                f.write(struct.pack('<4I',
-                    len(self.records),           # record_count
-                    self.header.field_count,     # field_count
-                    self.header.record_size,     # record_size
+                f.write(b'WDBC' + struct.pack('<4I',
+                    len(records),                # record_count
+                    field_count,                 # field_count
+                    records.dtype.itemsize,      # record_size
                     len(self.string_block)       # string_block_size
                 ))
 
-                # Write records using _pack_record
-                for record in self.records:
-                    record_bytes = self._pack_record(record)
-                    f.write(record_bytes)
-
-                # Write string block
+                # Write the whole record section and the string block in one go each
+                records.tofile(f)
                 f.write(self.string_block)
 
             return True
@@ -139,29 +245,72 @@ class DBCFile:
             print(f"Error saving DBC file: {str(e)}")
             return False
 
-    def _pack_record(self, record) -> bytes:
-        """Pack a record into bytes according to DBC format based on field types"""
-        result = bytearray()
-        for field_idx, field_type in enumerate(self.column_types):
-            value = record.get(field_idx, 0)  # Default to 0 if field doesn't exist
-            if field_type == 'string':
-                if isinstance(value, str):
-                    # Write the offset for the string
-                    offset = self.string_offsets.get(value, 0)
-                    result.extend(struct.pack('<I', offset))
-                else:
-                    result.extend(struct.pack('<I', 0))
-            elif field_type == 'float':
-                if isinstance(value, float):
-                    result.extend(struct.pack('<f', value))
-                else:
-                    result.extend(struct.pack('<f', float(value)))
-            else:  # Assume integer
-                if isinstance(value, int):
-                    result.extend(struct.pack('<I', value))
-                else:
-                    result.extend(struct.pack('<I', int(value)))
-        return bytes(result)
+    def field_slot(self, field_idx: int) -> Tuple[int, np.dtype]:
+        """Byte offset inside a record and storage dtype of a field, per the loaded layout"""
+        dtype, offset = self.record_layout.fields[self.record_layout.names[field_idx]][:2]
+        return offset, dtype
+
+    def patch_file(self, filepath: str, patches: List[Tuple[int, bytes]]) -> bool:
+        """Overwrite byte ranges of a file in place.
+
+        Patches are (file offset, bytes) pairs. The original bytes are read
+        back first, so a failed write puts every patched range back.
+        """
+        applied = []
+        try:
+            with open(filepath, 'r+b') as f:
+                try:
+                    for offset, data in sorted(patches):
+                        f.seek(offset)
+                        original = f.read(len(data))
+                        f.seek(offset)
+                        f.write(data)
+                        applied.append((offset, original))
+                    f.flush()
+                    os.fsync(f.fileno())
+                except Exception:
+                    for offset, original in reversed(applied):
+                        f.seek(offset)
+                        f.write(original)
+                    raise
+            return True
+
+        except Exception as e:
+            print(f"Error patching DBC file: {str(e)}")
+            return False
+
+    def pack_columns(self, columns: List[np.ndarray], names: Optional[List[str]] = None) -> np.ndarray:
+        """Pack per-field value arrays into one little-endian structured record array.
+
+        Uses the layout the file was loaded with when the field count still
+        matches, otherwise the layout of the current column types. Raises
+        ValueError, naming the column, for values the field's type can't hold.
+        """
+        if self.record_layout is not None and len(self.record_layout.names) == len(columns):
+            dtype = self.record_layout
+        else:
+            types = list(self.column_types[:len(columns)])
+            types.extend(['int'] * (len(columns) - len(types)))
+            dtype = field_layout(types)
+
+        records = np.zeros(len(columns[0]) if columns else 0, dtype=dtype)
+        for field_idx, (name, values) in enumerate(zip(dtype.names, columns)):
+            column = names[field_idx] if names is not None else f"Field_{field_idx}"
+            check_range(np.asarray(values), dtype.fields[name][0], column)
+            records[name] = values
+        return records
+
+    def get_column(self, field_idx: int) -> np.ndarray:
+        """Get a single field of every record as a (strided) array view"""
+        if field_idx in self.edited_columns:
+            return self.edited_columns[field_idx]
+        return self.records[self.records.dtype.names[field_idx]]
+
+    def edit_column(self, field_idx: int) -> np.ndarray:
+        """Get a writable copy of a field, copying it out of the mapping on first use"""
+        if field_idx not in self.edited_columns:
+            self.edited_columns[field_idx] = np.array(self.get_column(field_idx))
+        return self.edited_columns[field_idx]
 
     def set_column_types(self, types: List[str]):
         """Set the field types for the columns"""
@@ -175,7 +324,83 @@ class DBCFile:
 
     def get_string(self, offset: int) -> str:
         """Get string from string block at given offset"""
-        if offset >= len(self.string_block):
-            return ""
-        end = self.string_block.find(b'\0', offset)
-        return self.string_block[offset:end].decode('utf-8')
+        value = self._string_cache.get(offset)
+        if value is None:
+            if offset >= len(self.string_block):
+                return ""
+            end = self.string_block.find(b'\0', offset)
+            if end < 0:
+                end = len(self.string_block)  # Unterminated last string runs to the end of the block
+            # Interned so equal strings share one object across columns and files; invalid
+            # UTF-8 is replaced rather than failing the whole column
+            value = sys.intern(self.string_block[offset:end].decode('utf-8', errors='replace'))
+            self._string_cache[offset] = value
+        return value
+
+    def find_string(self, value: str) -> Optional[int]:
+        """Offset of some occurrence of a string in the string block, or None"""
+        offset = self._string_lookup.get(value)
+        if offset is None:
+            encoded = value.encode('utf-8')
+            if b'\0' in encoded:
+                return None
+            # Any NUL-terminated occurrence is a valid offset, including the tail of a longer string
+            offset = self.string_block.find(encoded + b'\0')
+            if offset < 0:
+                return None
+            self._string_lookup[value] = offset
+        return offset
+
+    def _block_strings(self):
+        """(start offsets, text id per start, texts, text -> id) of every string in the block.
+
+        The block is split and decoded in one pass the first time any column
+        is resolved, then shared by all string columns of the file. A text
+        id is the position of the text's first occurrence. False if the
+        block is not valid UTF-8 throughout.
+        """
+        if self._string_index is None:
+            block = bytes(self.string_block)
+            try:
+                # NUL never occurs inside a multi-byte character, so both splits line up
+                texts = list(map(sys.intern, block.decode('utf-8').split('\0')[:-1]))
+            except UnicodeDecodeError:
+                self._string_index = False
+                return False
+            lengths = np.fromiter(map(len, block.split(b'\0')[:-1]), dtype=np.int64, count=len(texts))
+            starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])) if texts else lengths
+            first = dict(zip(reversed(texts), range(len(texts) - 1, -1, -1)))
+            ids = np.fromiter(map(first.__getitem__, texts), dtype=np.int64, count=len(texts))
+            self._string_index = (starts, ids, texts, first)
+        return self._string_index
+
+    def resolve_strings(self, offsets: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """Resolve an array of string offsets in bulk.
+
+        Returns per-row codes and the list of distinct strings they index, so
+        each distinct offset is decoded once no matter how many rows use it.
+        """
+        unique_offsets, inverse = np.unique(offsets, return_inverse=True)
+        index = self._block_strings()
+        if index and len(index[0]):
+            starts, ids, texts, first = index
+            positions = np.minimum(np.searchsorted(starts, unique_offsets), len(starts) - 1)
+            exact = starts[positions] == unique_offsets
+            unique_ids = np.empty(len(unique_offsets), dtype=np.int64)
+            unique_ids[exact] = ids[positions[exact]]
+            # Offsets into the middle of a string (a shared suffix) or past the block
+            for i in np.flatnonzero(~exact):
+                text = self.get_string(int(unique_offsets[i]))
+                if text not in first:
+                    first[text] = len(texts)
+                    texts.append(text)
+                unique_ids[i] = first[text]
+            used, remap = np.unique(unique_ids, return_inverse=True)
+            return remap.astype(np.int32)[inverse.reshape(-1)], [texts[text_id] for text_id in used]
+
+        positions: Dict[str, int] = {}
+        remap = np.empty(len(unique_offsets), dtype=np.int32)
+        for i, offset in enumerate(unique_offsets):
+            # Different offsets can hold the same text
+            remap[i] = positions.setdefault(self.get_string(int(offset)), len(positions))
+        return remap[inverse.reshape(-1)], list(positions)
@@ -0,0 +1,64 @@
+import numpy as np
+from typing import Dict, Iterable, Tuple
+
+class StringBlockBuilder:
+    """Builds a WDBC string block from the distinct strings of any number of columns.
+
+    Every distinct string is stored once, and a string that is the tail of
+    another (e.g. "Fire" and "Spell_Fire") points into the longer string's
+    bytes instead of being written again. Offset 0 is always the empty
+    string.
+
+        builder = StringBlockBuilder()
+        ids = builder.add(uniques)      # per distinct value, ids into the builder
+        block, offsets = builder.build()
+        column_offsets = offsets[ids[codes]]
+    """
+
+    def __init__(self, merge_suffixes: bool = True):
+        self.merge_suffixes = merge_suffixes
+        self._ids: Dict[str, int] = {'': 0}
+        self._strings = ['']
+        self.offsets = None
+
+    def add(self, values: Iterable) -> np.ndarray:
+        """Register distinct values and return their ids"""
+        ids = []
+        for value in values:
+            value = str(value)
+            string_id = self._ids.get(value)
+            if string_id is None:
+                string_id = self._ids[value] = len(self._strings)
+                self._strings.append(value)
+            ids.append(string_id)
+        return np.array(ids, dtype=np.int64)
+
+    def build(self) -> Tuple[bytes, np.ndarray]:
+        """Lay out the block; returns it with the uint32 offset of every id"""
+        encoded = [value.encode('utf-8') for value in self._strings]
+        count = len(encoded)
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=count)
+        owner = np.arange(count)  # Id of the string whose bytes hold each string
+
+        if self.merge_suffixes and count > 2:
+            # Sorted by reversed bytes, every string that ends with another follows it
+            # directly, so one backwards pass hands each string its longest container
+            by_tail = sorted(range(1, count), key=lambda string_id: encoded[string_id][::-1])
+            for shorter, longer in zip(reversed(by_tail[:-1]), reversed(by_tail[1:])):
+                if encoded[longer].endswith(encoded[shorter]):
+                    owner[shorter] = owner[longer]
+
+        # Written strings keep first-seen order; offsets come from one cumulative sum
+        written = np.flatnonzero(owner[1:] == np.arange(1, count)) + 1
+        starts = np.zeros(count, dtype=np.int64)
+        starts[written] = 1 + np.concatenate(([0], np.cumsum(lengths[written] + 1)[:-1]))
+        offsets = starts[owner] + lengths[owner] - lengths
+        offsets[0] = 0
+
+        block = b'\0' + b''.join(encoded[string_id] + b'\0' for string_id in written)
+        self.offsets = offsets.astype(np.uint32)
+        return block, self.offsets
+
+    def offset_map(self) -> Dict[str, int]:
+        """String to offset mapping of the last build"""
+        return {value: int(offset) for value, offset in zip(self._strings, self.offsets)}
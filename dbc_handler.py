@@ -1,13 +1,34 @@
-from dbc.dbc_format import DBCFile
-from definitions_handler import DefinitionsHandler
+from dbc.dbc_format import DBCFile, DBCHeader, read_header, record_dtype
+from dbc.string_block import StringBlockBuilder
+from definitions_handler import DefinitionsHandler, DEFAULT_LOCALE
+from core.worker import JobCancelled
+from core.search_index import SearchIndex
+from core.primary_key import PrimaryKeyIndex
+from core.sort_cache import SortCache
+from core.dirty_tracker import DirtyTracker
+from core.table_cache import TableCache
+from core.cache_manager import CacheManager
+from core.relations import RelationResolver
+from core.diff import ChangeSet, diff_tables
+from core.bulk_edit import BulkEdit, select_rows, evaluate, check_values
+from core.history import EditHistory, CellChange, RowChange
+from core import columnar
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from typing import Optional
 import os
+import json
 import gc
 
+PATCH_CELL_LIMIT = 10000  # Beyond this many changed fields a full rewrite is cheaper than seeking
+# Everything that belongs to one loaded table, kept together in the memory cache
+TABLE_STATE = ('dataframe', 'dbc_file', 'current_table_name', 'locale_columns', 'index_column',
+               '_mapped_columns', '_unresolved_strings', '_loaded_file', '_table_key',
+               'primary_key', 'search_index', 'sort_cache')
+
 class DBCHandler:
-    def __init__(self, lazy_load=False):
+    def __init__(self, lazy_load=False, use_mmap=False):
         self.dbc_file = DBCFile()
         self.dataframe = None
         self.definition_handler = DefinitionsHandler()
@@ -17,13 +38,41 @@ class DBCHandler:
         self.chunk_size = 5000
         self.use_dtype_optimization = True
         self.lazy_load = lazy_load
+        self.use_mmap = use_mmap
+        self._mapped_columns = set()  # Column positions still backed by the file mapping
+        self._unresolved_strings = set()  # String column positions still holding raw offsets
+        self.locale = DEFAULT_LOCALE  # Locale shown for compound loc fields
+        self.locale_columns = {}
         self.chunk_iterator = None
         self.processed_chunks = []
         self.last_definition_file = None
-
-    def load_definition_file(self, filepath: str) -> bool:
-        """Load definition file and store it for reuse"""
-        if filepath == self.last_definition_file:
+        self.selected_definition_file = None  # Build chosen by the user, preferred when it fits a file
+        self.auto_detect_definition = True  # Switch builds to match each file's header
+        self.search_index = SearchIndex()  # Per-column filter indexes, built on first query
+        self.sort_cache = SortCache()  # Row permutations per sorted column set
+        self.index_column = None  # Position of the definition's IsIndex column
+        self.dirty = DirtyTracker()  # Cells changed since the last load or save
+        self._loaded_file = None  # (path, mtime, size) of the file on disk the records match
+        self.primary_key = PrimaryKeyIndex()
+        self._table_key = None  # Memory cache key of the loaded table
+        # Parsed tables on disk by file content; None always parses. A mapped file parses in less
+        # time than hashing it for a cache lookup takes, so only copying loads use the cache
+        self.table_cache = None if use_mmap else TableCache()
+        self._pending_cache = None  # (cache key, file state) of a parsed table not yet written to the cache
+        self.memory_cache = CacheManager()  # Recently left tables by path and definition; None disables
+        self.relations = RelationResolver(self, self._open_related_table)  # Joins to referenced tables
+        self.change_set = None  # Last comparison of the loaded table with another file
+        self.history = EditHistory()  # Undo and redo of edits since the table was loaded
+
+    def load_definition_file(self, filepath: str, selected: bool = True) -> bool:
+        """Load definition file and store it for reuse.
+
+        selected marks it as the user's choice rather than a build detected
+        from a file header.
+        """
+        if selected:
+            self.selected_definition_file = filepath
+        if filepath == self.last_definition_file and filepath == self.definition_handler.current_definition_file:
             return True  # Already loaded
 
         success = self.definition_handler.load_definition(filepath)
@@ -33,81 +82,564 @@ class DBCHandler:
             print(f"Successfully loaded and cached definition: {filepath}")
         return success
 
-    def load_dbc(self, filepath: str, callback=None, use_chunks=True) -> bool:
+    def definition_matches(self, table_name: str, header: DBCHeader) -> list:
+        """Definition builds whose layout of a table matches a DBC header"""
+        store = self.definition_handler.store
+        store.load_all()  # Only loads from the compiled index the first time
+        return store.match(table_name, header.field_count, header.record_size)
+
+    def detect_definition(self, table_name: str, header: DBCHeader):
+        """Find the definition build whose layout of a table matches a DBC header.
+
+        The user's selected build wins, then the build in use, when they fit.
+        Otherwise only a single match is taken: builds sharing a layout can
+        still name its fields differently, so None is returned for several.
+        """
+        matches = self.definition_matches(table_name, header)
+        store = self.definition_handler.store
+        match_keys = {store._key(match) for match in matches}
+        for preferred in (self.selected_definition_file, self.definition_handler.current_definition_file):
+            if preferred and store._key(preferred) in match_keys:
+                return preferred
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    def _select_definition(self, table_name: str, header: DBCHeader):
+        """Switch to the definition build matching a DBC header, if there is exactly one"""
+        definition_file = self.detect_definition(table_name, header)
+        if definition_file is None:
+            matches = self.definition_matches(table_name, header)
+            if matches:
+                names = ', '.join(Path(match).stem for match in matches)
+                print(f"Several definitions match {table_name} ({names}), "
+                      f"select the right build; keeping the current one")
+            else:
+                print(f"No definition matches {table_name} "
+                      f"({header.field_count} fields, {header.record_size} byte records)")
+        elif definition_file != self.definition_handler.current_definition_file:
+            print(f"Detected definition {Path(definition_file).name} for {table_name}")
+            self.load_definition_file(definition_file, selected=False)
+
+    def load_dbc(self, filepath: str, callback=None, use_chunks=True, table_name: Optional[str] = None) -> bool:
+        """Load a DBC file; the table name defaults to the file name (Achievement.dbc -> Achievement)"""
         try:
             if not os.path.exists(filepath):
                 print(f"File not found: {filepath}")
                 return False
 
+            self._remember_table()
+            self._pending_cache = None
             self.dataframe = None
-            if not self.dbc_file.load_file(filepath):
+            self.chunk_iterator = None
+            self._mapped_columns = set()
+            self._unresolved_strings = set()
+            self.locale_columns = {}
+            self.index_column = None
+            self.primary_key.clear()
+            self.dirty.clear()
+            self._loaded_file = None
+            self._table_key = None
+            self.change_set = None
+            self.history.clear()
+
+            if table_name is None:
+                table_name = Path(filepath).stem
+                if table_name.lower().endswith('.dbc'):
+                    table_name = table_name[:-4]  # Remove .dbc extension
+            self.current_table_name = table_name
+
+            if self.auto_detect_definition:
+                header = read_header(filepath)
+                if header is not None:
+                    self._select_definition(table_name, header)
+
+            print(f"Looking up definition for table: {table_name}")
+            field_names = self.definition_handler.get_field_names(table_name)
+            table_key = self._memory_key(filepath, field_names)
+            if self._restore_table(filepath, table_key):
+                if callback:
+                    callback(1.0)
+                return True
+
+            _, field_types, _, _ = self._expand_fields(field_names)
+            cache_key = self._cache_key(filepath, field_names)
+            if callback:
+                callback(0.1)
+
+            if cache_key and self._load_cached(filepath, field_types, cache_key):
+                self._table_key = table_key
+                if callback:
+                    callback(1.0)
+                return True
+
+            # Decode the record section with the definition's field types
+            if not self.dbc_file.load_file(filepath, field_types, use_mmap=self.use_mmap):
                 return False
+            self._loaded_file = self._file_state(filepath)
 
             total_records = len(self.dbc_file.records)
             if (total_records == 0):
                 return False
 
             print(f"Loading {total_records} records...")
-
-            records_data = pd.DataFrame(self.dbc_file.records)
-
-            if use_chunks:
-                self.chunk_iterator = np.array_split(records_data, max(1, len(records_data) // self.chunk_size))
-
-                if self.lazy_load:
-                    try:
-                        self.dataframe = next(iter(self.chunk_iterator))
-                        if self.use_dtype_optimization:
-                            self._optimize_datatypes(self.dataframe)
-                    except StopIteration:
-                        print("No data in first chunk")
-                        return False
-                else:
-                    self.processed_chunks = []
-                    for chunk in self.chunk_iterator:
-                        if self.use_dtype_optimization:
-                            self._optimize_datatypes(chunk)
-                        self.processed_chunks.append(chunk)
-                        if callback:
-                            callback(len(self.processed_chunks) / len(self.chunk_iterator))
-
-                    self.dataframe = pd.concat(self.processed_chunks, ignore_index=True)
-                    self.processed_chunks = []
+            if callback:
+                callback(0.4)
+
+            if self.dbc_file.is_mapped:
+                # Columns stay zero-copy views over the mapping until they are edited
+                self.dataframe = self._records_to_dataframe(self.dbc_file.records, copy=False)
+                self._mapped_columns = set(range(len(self.dataframe.columns)))
+                if callback:
+                    callback(1.0)
             else:
-                self.dataframe = records_data
-                if self.use_dtype_optimization:
-                    self._optimize_datatypes(self.dataframe)
-
-            table_name = Path(filepath).stem
-            if table_name.lower().endswith('.dbc'):
-                table_name = table_name[:-4]  # Remove .dbc extension
-            self.current_table_name = table_name
-
-            print(f"Looking up definition for table: {table_name}")
+                self.dataframe = self._records_to_dataframe(self.dbc_file.records)
 
-            field_names = self.definition_handler.get_field_names(table_name)
+                if self.lazy_load and total_records > self.chunk_size:
+                    full_data = self.dataframe
+                    self.dataframe = full_data.iloc[:self.chunk_size].copy()
+                    self.chunk_iterator = (
+                        full_data.iloc[start:start + self.chunk_size].copy()
+                        for start in range(self.chunk_size, total_records, self.chunk_size)
+                    )
 
-            if field_names:
-                print(f"Applying defined field names for table '{table_name}'")
-                if self.apply_field_names(field_names):
-                    print(f"Successfully applied field names from definition")
-                else:
-                    print(f"Failed to apply defined field names")
-                    self.dataframe.columns = [f"Field_{i}" for i in range(len(self.dataframe.columns))]
-            else:
-                print(f"No definition found for {table_name}, using generic field names")
-                self.dataframe.columns = [f"Field_{i}" for i in range(len(self.dataframe.columns))]
+                if self.use_dtype_optimization:
+                    # Column optimization covers the remaining progress range
+                    column_callback = (lambda fraction: callback(0.4 + 0.6 * fraction)) if callback and use_chunks else None
+                    self._optimize_datatypes(self.dataframe, column_callback)
 
+            if not self._apply_definition(table_name, field_names):
+                return False
+            self._table_key = table_key
+            if cache_key:
+                # Written when the table is left or the handler closed, see flush_table_cache
+                self._pending_cache = (cache_key, self._loaded_file)
             return True
 
+        except JobCancelled:
+            self.dataframe = None
+            raise
         except Exception as e:
             print(f"Error loading DBC: {str(e)}")
             return False
         finally:
-            if hasattr(self.dbc_file, 'records'):
+            if hasattr(self.dbc_file, 'records') and not self.dbc_file.is_mapped:
                 self.dbc_file.records = None
             gc.collect()
 
+    def _apply_definition(self, table_name: str, field_names) -> bool:
+        """Name the loaded columns after the table definition"""
+        if field_names:
+            print(f"Applying defined field names for table '{table_name}'")
+            if self.apply_field_names(field_names):
+                print(f"Successfully applied field names from definition")
+            else:
+                print(f"Failed to apply defined field names")
+                self.dataframe.columns = [f"Field_{i}" for i in range(len(self.dataframe.columns))]
+        else:
+            print(f"No definition found for {table_name}, using generic field names")
+            self.dataframe.columns = [f"Field_{i}" for i in range(len(self.dataframe.columns))]
+            self.dbc_file.set_column_types(['int'] * len(self.dataframe.columns))
+
+        self._build_primary_key()
+        return True
+
+    def _memory_key(self, filepath: str, field_names) -> tuple:
+        """Memory cache key: the file and the table definition it is decoded with.
+
+        Keyed by the table's fields rather than the build, so builds that
+        define the table the same way share one entry.
+        """
+        return os.path.normcase(os.path.abspath(filepath)), json.dumps(field_names, sort_keys=True, default=str)
+
+    def _remember_table(self):
+        """Keep the current table in the memory cache before another one replaces it"""
+        self.flush_table_cache()
+        if self.memory_cache is None or self.dataframe is None or self._table_key is None:
+            return
+        key = self._table_key
+        if self.dirty.is_dirty() or self.chunk_iterator is not None:
+            # The cached state shares the edited DataFrame, it no longer matches the file
+            self.memory_cache.discard(key)
+            return
+        size = int(self.dataframe.memory_usage(deep=True).sum()) + len(self.dbc_file.string_block)
+        self.memory_cache.set(key, {name: getattr(self, name) for name in TABLE_STATE}, size)
+        # The cached table owns these now, the next table starts with its own
+        self.dbc_file = DBCFile()
+        self.primary_key = PrimaryKeyIndex()
+        self.search_index = SearchIndex()
+        self.sort_cache = SortCache()
+
+    def _restore_table(self, filepath: str, key: tuple) -> bool:
+        """Switch back to a table from the memory cache if the file has not changed since"""
+        if self.memory_cache is None:
+            return False
+        file_state = self._file_state(filepath)
+        state = self.memory_cache.get(key, lambda state: state['_loaded_file'] == file_state)
+        if state is None:
+            return False
+        for name, value in state.items():
+            setattr(self, name, value)
+        print(f"Reopened {len(self.dataframe)} records of {self.current_table_name} from memory")
+        return True
+
+    def _cache_key(self, filepath: str, field_names):
+        """Table cache key for a file decoded with the current definition, or None without a cache"""
+        if self.table_cache is None or self.lazy_load:
+            return None
+        definition = self.definition_handler.current_definition_file
+        layout = {'fields': field_names, 'mapped': self.use_mmap, 'optimized': self.use_dtype_optimization}
+        try:
+            return self.table_cache.key(filepath, Path(definition).name if definition else None, layout)
+        except OSError as e:
+            print(f"Table cache unavailable: {e}")
+            return None
+
+    def _load_cached(self, filepath: str, field_types, cache_key: str) -> bool:
+        """Map a previously parsed copy of the file from the table cache"""
+        cached = self.table_cache.get(cache_key)
+        if cached is None:
+            return False
+        # Strings are stored decoded, only the header is read for saving in place
+        header = read_header(filepath)
+        if header is None:
+            return False
+        self.dbc_file.close()
+        self.dbc_file.records = None
+        self.dbc_file.header = header
+        self.dbc_file.record_layout = record_dtype(header, field_types)
+        self.dbc_file.string_block = b''  # Edits adding or changing text are saved by a full rewrite
+        self._use_table(*cached)
+        self._loaded_file = self._file_state(filepath)
+        print(f"Loaded {len(self.dataframe)} records from the table cache")
+        return True
+
+    def flush_table_cache(self):
+        """Write the parsed table to the table cache if it still matches the file it was read from.
+
+        Deferred from load_dbc so a first open stays lazy; string columns are
+        decoded here, so a hit needs nothing from the DBC file but its header.
+        """
+        if self._pending_cache is None:
+            return
+        cache_key, file_state = self._pending_cache
+        self._pending_cache = None
+        if (self.table_cache is None or self.dataframe is None or self.dirty.is_dirty()
+                or self._loaded_file != file_state or self._file_state(file_state[0]) != file_state):
+            return
+        for col_idx in sorted(self._unresolved_strings):
+            self.resolve_string_column(col_idx)
+        self.table_cache.put(cache_key, self.dataframe, self._table_metadata())
+
+    def _build_primary_key(self):
+        """Index the IsIndex column (or a leading ID column) by value"""
+        if self.index_column is None and len(self.dataframe.columns) and self.dataframe.columns[0] == 'ID':
+            self.index_column = 0
+        if self.index_column is None:
+            self.primary_key.clear()
+            return
+        self.primary_key.build(self.dataframe.iloc[:, self.index_column].to_numpy())
+
+    def _records_to_dataframe(self, records: np.ndarray, copy: bool = True) -> pd.DataFrame:
+        """Build a DataFrame straight from the columns of a structured record array"""
+        return pd.DataFrame({
+            field_idx: records[name]
+            for field_idx, name in enumerate(records.dtype.names)
+        }, copy=copy)
+
+    def _materialize_column(self, col_idx: int):
+        """Replace a column that is still a view over the file mapping with a private copy"""
+        if col_idx in self._mapped_columns:
+            if self.dbc_file.records is not None:
+                self.dataframe.isetitem(col_idx, self.dbc_file.edit_column(col_idx))
+            else:
+                # Mapped from an imported table rather than a DBC file
+                self.dataframe.isetitem(col_idx, self.dataframe.iloc[:, col_idx].copy(deep=True))
+            self._mapped_columns.discard(col_idx)
+
+    def _detach_mapping(self):
+        """Copy every remaining mapped column into memory and release the file mapping"""
+        for col_idx in sorted(self._mapped_columns):
+            self._materialize_column(col_idx)
+        self.dbc_file.records = None
+        self.dbc_file.close()
+
+    def resolve_string_column(self, col_idx: int):
+        """Turn a column of string offsets into a categorical of the actual text"""
+        if col_idx not in self._unresolved_strings:
+            return
+        codes, categories = self.dbc_file.resolve_strings(self.dataframe.iloc[:, col_idx].to_numpy())
+        self.dataframe.isetitem(col_idx, pd.Categorical.from_codes(codes, categories=categories))
+        self._unresolved_strings.discard(col_idx)
+        self._mapped_columns.discard(col_idx)
+
+    def get_page(self, rows: slice, columns=slice(None)) -> pd.DataFrame:
+        """Get a slice of the DataFrame with its string columns decoded for just those rows"""
+        page = self.dataframe.iloc[rows, columns]
+        if isinstance(columns, slice):
+            col_positions = range(len(self.dataframe.columns))[columns]
+        else:
+            col_positions = list(columns)
+        pending = [
+            (page_idx, col_idx) for page_idx, col_idx in enumerate(col_positions)
+            if col_idx in self._unresolved_strings
+        ]
+        if pending:
+            page = page.copy()
+            for page_idx, col_idx in pending:
+                offsets = page.iloc[:, page_idx].to_numpy()
+                page.isetitem(page_idx, [self.dbc_file.get_string(int(offset)) for offset in offsets])
+        return page
+
+    def get_display_columns(self) -> list:
+        """Column positions to show: every column except other locales of loc fields"""
+        if self.dataframe is None:
+            return []
+        return [
+            col_idx for col_idx in range(len(self.dataframe.columns))
+            if self.locale_columns.get(col_idx, self.locale) == self.locale
+        ]
+
+    def set_locale(self, locale: str):
+        """Choose which locale slot of loc fields is shown"""
+        self.locale = locale
+
+    def set_cell(self, row_idx: int, col_idx: int, value):
+        """Set a single value in the loaded DataFrame by position"""
+        self.resolve_string_column(col_idx)
+        column = self.dataframe.iloc[:, col_idx]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            value = str(value)
+        elif pd.api.types.is_float_dtype(column.dtype):
+            value = float(value)
+        elif pd.api.types.is_integer_dtype(column.dtype):
+            value = int(value)
+
+        rows = np.array([row_idx])
+        old_values = column.iloc[rows].to_numpy()
+        new_values = np.array([value], dtype=object if isinstance(value, str) else None)
+        self._write_values(col_idx, rows, new_values)
+        self.history.record(CellChange(col_idx, rows, old_values, new_values))
+
+    def _write_values(self, col_idx: int, rows: np.ndarray, values: np.ndarray):
+        """Write values into a column at some rows, widening it or adding categories as needed"""
+        self._materialize_column(col_idx)
+        column = self.dataframe.iloc[:, col_idx]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            new_categories = pd.Index(pd.unique(values)).dropna().difference(column.cat.categories)
+            if len(new_categories):
+                self.dataframe.isetitem(col_idx, column.cat.add_categories(new_categories))
+        elif values.dtype.kind in 'iu' and column.dtype.kind in 'iu':
+            limits = np.iinfo(column.dtype)
+            if values.min() < limits.min or values.max() > limits.max:
+                # Downcast column can't hold the new values, widen it
+                self.dataframe.isetitem(col_idx, column.astype(np.int64))
+            else:
+                values = values.astype(column.dtype)
+        elif column.dtype.kind == 'f':
+            values = values.astype(column.dtype)
+
+        if col_idx == self.index_column and len(rows) == 1:
+            self.primary_key.update(int(rows[0]), int(column.iloc[rows[0]]), int(values[0]))
+        self.dataframe.iloc[rows, col_idx] = values
+        if col_idx == self.index_column and len(rows) > 1:
+            self._build_primary_key()
+        self.dirty.mark(rows, col_idx)
+        self._column_changed(col_idx)
+
+    def bulk_edit(self, assignment: str, where: Optional[str] = None) -> Optional[int]:
+        """Apply `Column = expression` to every row matching a condition in one vectorized step.
+
+        E.g. bulk_edit("Points = Points * 2", "Category == 92"). The values
+        are checked against the column's definition type before anything is
+        written. Returns the number of records that changed, or None on error.
+        """
+        if self.dataframe is None:
+            print("No table loaded to edit")
+            return None
+        try:
+            edit = BulkEdit.parse(assignment, where)
+            if edit.column not in self.dataframe.columns:
+                raise KeyError(f"No column named {edit.column}")
+            col_idx = self.dataframe.columns.get_loc(edit.column)
+            # Strings are compared and computed as text, not as block offsets
+            for name in edit.referenced_columns(self.dataframe.columns) + [edit.column]:
+                self.resolve_string_column(self.dataframe.columns.get_loc(name))
+
+            rows = select_rows(self.dataframe, edit)
+            column = self.dataframe.iloc[:, col_idx]
+            column_types = self.dbc_file.column_types
+            column_type = column_types[col_idx] if col_idx < len(column_types) else None
+            values = check_values(evaluate(self.dataframe, edit, rows), edit.column, column_type, column.dtype)
+        except Exception as e:
+            print(f"Bulk edit failed: {type(e).__name__}: {e}")
+            return None
+
+        # Only records whose value actually differs are written and marked dirty
+        old_values = column.iloc[rows].to_numpy(dtype=object if values.dtype == object else None)
+        changed = old_values != values
+        if values.dtype.kind == 'f':
+            changed &= ~(np.isnan(old_values.astype(float)) & np.isnan(values))
+        rows, values = rows[changed], values[changed]
+        if len(rows) == 0:
+            print(f"Bulk edit matched no records to change ({edit.column})")
+            return 0
+
+        self._write_values(col_idx, rows, values)
+        if not self.history.record(CellChange(col_idx, rows, old_values[changed], values)):
+            print("Warning: The bulk edit is too large to be undone")
+        print(f"Bulk edit set {edit.column} on {len(rows):,} records")
+        return len(rows)
+
+    def row_of_id(self, record_id: int):
+        """Row position of a record ID, or None"""
+        return self.primary_key.get(record_id)
+
+    def get_by_id(self, record_id: int):
+        """The record with an ID as a Series with its strings decoded, or None"""
+        row_idx = self.primary_key.get(record_id)
+        if row_idx is None:
+            return None
+        return self.get_page(slice(row_idx, row_idx + 1)).iloc[0]
+
+    def insert_row(self, row_idx=None, values=None) -> int:
+        """Insert a row (appended by default) and return its position.
+
+        Unspecified fields are zero or empty; the IsIndex field defaults to
+        one past the highest ID.
+        """
+        values = dict(values or {})
+        row_count = len(self.dataframe.index)
+        row_idx = row_count if row_idx is None else max(0, min(row_idx, row_count))
+        if self.index_column is not None:
+            values.setdefault(self.dataframe.columns[self.index_column], self.primary_key.next_id())
+
+        # The table is rebuilt around the new row, mapped columns cannot be kept
+        self._detach_mapping()
+        self._mapped_columns = set()
+        new_row = {}
+        for col_idx, column in enumerate(self.dataframe.columns):
+            if column in values:
+                self.resolve_string_column(col_idx)
+            series = self.dataframe.iloc[:, col_idx]
+            value = values.get(column, '' if isinstance(series.dtype, pd.CategoricalDtype) else 0)
+            if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+                self.dataframe.isetitem(col_idx, series.cat.add_categories([value]))
+            new_row[col_idx] = [value]
+        new_row = pd.DataFrame(new_row).astype(dict(enumerate(self.dataframe.dtypes)))
+        new_row.columns = self.dataframe.columns
+
+        self.dataframe = pd.concat(
+            [self.dataframe.iloc[:row_idx], new_row, self.dataframe.iloc[row_idx:]], ignore_index=True
+        )
+        self.dirty.mark_structure()
+        if row_idx == row_count and self.index_column is not None:
+            self.primary_key.append(row_idx, int(self.dataframe.iloc[row_idx, self.index_column]))
+        else:
+            self._build_primary_key()
+        rows = np.array([row_idx])
+        self.history.record(RowChange(True, rows, self._row_records(rows)))
+        return row_idx
+
+    def delete_rows(self, row_indices) -> bool:
+        """Delete rows by position"""
+        if self.dataframe is None or len(row_indices) == 0:
+            return False
+        rows = np.unique(np.asarray(row_indices, dtype=np.int64))
+        records = self._row_records(rows)
+        self._remove_rows(rows)
+        if not self.history.record(RowChange(False, rows, records)):
+            print("Warning: Deleting this many rows can't be undone")
+        return True
+
+    def _row_records(self, rows: np.ndarray) -> pd.DataFrame:
+        """Copy of some rows for the history, text as plain strings.
+
+        Raw offsets may not survive a save, and a categorical slice would
+        keep every category of its column alive.
+        """
+        records = self.get_page(rows)
+        for page_idx, dtype in enumerate(records.dtypes):
+            if isinstance(dtype, pd.CategoricalDtype):
+                records.isetitem(page_idx, records.iloc[:, page_idx].astype(object))
+        return records
+
+    def _remove_rows(self, rows: np.ndarray):
+        self._detach_mapping()
+        self._mapped_columns = set()
+        self.dataframe = self.dataframe.drop(index=self.dataframe.index[rows]).reset_index(drop=True)
+        self.dirty.mark_structure()
+        self._build_primary_key()
+
+    def _insert_records(self, rows: np.ndarray, records: pd.DataFrame):
+        """Put rows back at the given positions of the resulting table"""
+        self._detach_mapping()
+        self._mapped_columns = set()
+        row_count = len(self.dataframe.index)
+        columns = {}
+        for col_idx in range(len(self.dataframe.columns)):
+            values = records.iloc[:, col_idx]
+            if not pd.api.types.is_numeric_dtype(values.dtype):
+                self.resolve_string_column(col_idx)  # Records hold text, the table may still hold offsets
+            series = self.dataframe.iloc[:, col_idx]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+                new_categories = pd.Index(pd.unique(values)).dropna().difference(series.cat.categories)
+                if len(new_categories):
+                    series = series.cat.add_categories(new_categories)
+                    self.dataframe.isetitem(col_idx, series)
+                columns[col_idx] = pd.Categorical(values, categories=series.cat.categories)
+                continue
+            values = values.to_numpy()
+            if values.dtype.kind in 'iu' and series.dtype.kind in 'iu' and len(values):
+                limits = np.iinfo(series.dtype)
+                if values.min() < limits.min or values.max() > limits.max:
+                    self.dataframe.isetitem(col_idx, series.astype(np.int64))
+                    series = self.dataframe.iloc[:, col_idx]
+            columns[col_idx] = values.astype(series.dtype)
+        inserted = pd.DataFrame(columns)
+        inserted.columns = self.dataframe.columns
+
+        # Inserted rows are appended, then a single take moves every row to its position
+        is_inserted = np.zeros(row_count + len(rows), dtype=bool)
+        is_inserted[rows] = True
+        order = np.empty(len(is_inserted), dtype=np.int64)
+        order[~is_inserted] = np.arange(row_count)
+        order[is_inserted] = row_count + np.arange(len(rows))
+        self.dataframe = pd.concat([self.dataframe, inserted], ignore_index=True).take(order).reset_index(drop=True)
+        self.dirty.mark_structure()
+        self._build_primary_key()
+
+    def undo(self) -> bool:
+        """Revert the last edit, returns False when there is nothing to undo"""
+        change = self.history.undo()
+        if change is None:
+            return False
+        self._apply_change(change, reverse=True)
+        return True
+
+    def redo(self) -> bool:
+        """Make the last undone edit again"""
+        change = self.history.redo()
+        if change is None:
+            return False
+        self._apply_change(change, reverse=False)
+        return True
+
+    def _apply_change(self, change, reverse: bool):
+        if isinstance(change, CellChange):
+            self.resolve_string_column(change.col_idx)
+            self._write_values(change.col_idx, change.rows, change.old_values if reverse else change.new_values)
+        elif change.inserted != reverse:
+            self._insert_records(change.rows, change.records)
+        else:
+            self._remove_rows(change.rows)
+
+    def _column_changed(self, col_idx: int):
+        """Drop everything derived from a column's values after it was edited"""
+        self.search_index.invalidate(col_idx)
+        self.sort_cache.invalidate(col_idx)
+
     def load_dbc_all(self, filepath: str) -> bool:
         """
         Quickly load all records at once for large DBC files.
@@ -132,7 +664,7 @@ class DBCHandler:
             return False
 
         print(f"Loading all {total_records} records at once...")
-        df = pd.DataFrame(self.dbc_file.records)
+        df = self._records_to_dataframe(self.dbc_file.records)
         if self.use_dtype_optimization:
             self._optimize_datatypes(df)
         self.dataframe = df
@@ -148,96 +680,263 @@ class DBCHandler:
             'row_count': len(self.dataframe),
             'column_count': len(self.dataframe.columns),
             'memory_usage': self.dataframe.memory_usage(deep=True).sum() / 1024 / 1024,
-            'numeric_columns': self.dataframe.select_dtypes(include=['number']).columns.tolist()
+            'numeric_columns': self.dataframe.select_dtypes(include=['number']).columns.tolist(),
+            'memory_cache': self.memory_cache.stats() if self.memory_cache else None,
+            'history': self.history.stats(),
         }
         return stats
 
-    def _optimize_datatypes(self, df):
+    def _optimize_datatypes(self, df, callback=None):
         try:
-            for col in df.columns:
-                if pd.api.types.is_numeric_dtype(df[col]):
+            total_columns = len(df.columns)
+            for col_idx, col in enumerate(df.columns):
+                if callback:
+                    callback((col_idx + 1) / total_columns)
+                if pd.api.types.is_integer_dtype(df[col]) and df[col].dtype.itemsize <= 4:
                     col_min = df[col].min()
                     col_max = df[col].max()
 
-                    if pd.api.types.is_integer_dtype(df[col]):
-                        if col_min >= 0:
-                            if col_max <= 255:
-                                df[col] = df[col].astype(np.uint8)
-                            elif col_max <= 65535:
-                                df[col] = df[col].astype(np.uint16)
-                            else:
-                                df[col] = df[col].astype(np.uint32)
+                    if col_min >= 0:
+                        if col_max <= 255:
+                            df[col] = df[col].astype(np.uint8)
+                        elif col_max <= 65535:
+                            df[col] = df[col].astype(np.uint16)
+                        else:
+                            df[col] = df[col].astype(np.uint32)
+                    else:
+                        if col_min >= -128 and col_max <= 127:
+                            df[col] = df[col].astype(np.int8)
+                        elif col_min >= -32768 and col_max <= 32767:
+                            df[col] = df[col].astype(np.int16)
                         else:
-                            if col_min >= -128 and col_max <= 127:
-                                df[col] = df[col].astype(np.int8)
-                            elif col_min >= -32768 and col_max <= 32767:
-                                df[col] = df[col].astype(np.int16)
-                            else:
-                                df[col] = df[col].astype(np.int32)
+                            df[col] = df[col].astype(np.int32)
 
             gc.collect()
+        except JobCancelled:
+            raise
         except Exception as e:
             print(f"Optimization error: {e}")
 
+    def find_rows(self, column: str, value: str) -> np.ndarray:
+        """Row positions whose value contains the text (or equals it, for numbers).
+
+        A `Column.TargetColumn` path searches the table the column references.
+        """
+        if column not in self.dataframe.columns and '.' in column:
+            return self.relations.find_rows(column, value)
+        col_idx = self.dataframe.columns.get_loc(column)
+        self.resolve_string_column(col_idx)
+        index = self.search_index.get(self.dataframe, col_idx)
+        if index.numeric:
+            try:
+                return index.equals(float(value))
+            except ValueError:
+                pass
+        return index.contains(value)
+
+    def find_range(self, column: str, low=None, high=None) -> np.ndarray:
+        """Row positions of a numeric column with low <= value <= high"""
+        col_idx = self.dataframe.columns.get_loc(column)
+        return self.search_index.get(self.dataframe, col_idx).between(low, high)
+
+    def get_related(self, path: str, rows=slice(None)) -> pd.Series:
+        """Values of a referenced table's column (`Category.Name_Lang_enUS`) joined onto rows"""
+        return self.relations.resolve(path, rows)
+
+    def get_reference_labels(self, rows, columns) -> dict:
+        """Column position -> names of the records the IDs in those rows point at"""
+        if self.dataframe is None:
+            return {}
+        return self.relations.labels(rows, columns)
+
+    def _open_related_table(self, table_name: str):
+        """Load a referenced table from the current file's folder with the same definition build"""
+        if self._loaded_file is None:
+            return None
+        folder = os.path.dirname(self._loaded_file[0])
+        filename = f"{table_name}.dbc".lower()
+        path = next((os.path.join(folder, name) for name in os.listdir(folder) if name.lower() == filename), None)
+        if path is None:
+            print(f"Referenced table {table_name} not found in {folder}")
+            return None
+
+        related = DBCHandler(use_mmap=True)
+        related.definition_handler = self.definition_handler
+        related.auto_detect_definition = False
+        related.table_cache = self.table_cache
+        related.memory_cache = None
+        related.locale = self.locale
+        if not related.load_dbc(path):
+            return None
+        return related
+
+    def diff_with(self, filepath: str, callback=None, definition_file: Optional[str] = None) -> Optional[ChangeSet]:
+        """Compare the loaded table with another version of it (e.g. the stock file or a backup copy).
+
+        The other file is read as the loaded table with the current definition
+        build, whatever its file name; pass definition_file to read it with
+        another build instead. The loaded table is the new side. Records are
+        matched on the IsIndex column when both versions have it, otherwise by
+        position.
+        """
+        if self.dataframe is None:
+            print("No table loaded to compare")
+            return None
+        other = DBCHandler(use_mmap=True)
+        if definition_file is None:
+            other.definition_handler = self.definition_handler
+        elif not other.load_definition_file(definition_file):
+            print(f"Failed to load definition {definition_file} for comparison")
+            return None
+        other.auto_detect_definition = False
+        other.table_cache = self.table_cache
+        other.memory_cache = None
+        if not other.load_dbc(filepath, callback, table_name=self.current_table_name):
+            print(f"Failed to load {filepath} for comparison")
+            return None
+
+        # Strings are compared as text, their offsets differ between files
+        for handler in (self, other):
+            for col_idx in sorted(handler._unresolved_strings):
+                handler.resolve_string_column(col_idx)
+        key = self.dataframe.columns[self.index_column] if self.index_column is not None else None
+        if key is not None and key not in other.dataframe.columns:
+            key = None
+        self.change_set = diff_tables(other.dataframe, self.dataframe, key)
+        print(f"Compared with {filepath}: {self.change_set.summary()}")
+        return self.change_set
+
+    def export_changes(self, filepath: str) -> bool:
+        """Write the last comparison to .csv or .json"""
+        if self.change_set is None:
+            print("No comparison to export")
+            return False
+        try:
+            self.change_set.export(filepath)
+            print(f"Exported changes to {filepath}")
+            return True
+        except Exception as e:
+            print(f"Error exporting changes: {str(e)}")
+            return False
+
     def filter_data(self, column: str, value: str) -> pd.DataFrame:
         """Filter DataFrame by column value"""
         if not self.dataframe is None:
             try:
-                return self.dataframe[self.dataframe[column].astype(str).str.contains(value, case=False)]
-            except:
+                return self.dataframe.iloc[self.find_rows(column, value)]
+            except Exception as e:
+                print(f"Error filtering by {column}: {e}")
                 return self.dataframe
         return pd.DataFrame()
 
+    def sort_rows(self, columns, ascending=True) -> np.ndarray:
+        """Row permutation sorting by one or more columns (names or positions), stable.
+
+        The permutation is cached and read-only; page through it instead of
+        copying the table.
+        """
+        if not isinstance(columns, (list, tuple)):
+            columns = [columns]
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(columns)
+        col_positions = [
+            col if isinstance(col, (int, np.integer)) else self.dataframe.columns.get_loc(col)
+            for col in columns
+        ]
+        for col_idx in col_positions:
+            self.resolve_string_column(col_idx)
+        return self.sort_cache.get(self.dataframe, col_positions, ascending)
+
     def sort_data(self, column: str, ascending: bool = True) -> pd.DataFrame:
         """Sort DataFrame by column"""
         if not self.dataframe is None:
             try:
-                return self.dataframe.sort_values(column, ascending=ascending)
-            except:
+                return self.dataframe.iloc[self.sort_rows(column, ascending)]
+            except Exception as e:
+                print(f"Error sorting by {column}: {e}")
                 return self.dataframe
         return pd.DataFrame()
 
-    def save_dbc(self, filepath: str, dataframe: pd.DataFrame) -> bool:
-        """Save DataFrame back to DBC format"""
+    def save_dbc(self, filepath: str, dataframe: pd.DataFrame, patch: bool = True) -> bool:
+        """Save DataFrame back to DBC format.
+
+        With patch=False the whole file is rewritten even when the edits
+        could be patched in place (or there are none).
+        """
         try:
             if dataframe is None or dataframe.empty:
                 print("No data to save")
                 return False
 
-            # Update DBC file records from DataFrame
-            self.dbc_file.records = []
-            string_block = bytearray()
-            string_offsets = {}
-
-            # Process each row in the DataFrame
-            for idx, row in dataframe.iterrows():
-                record = {}
-                for col_idx, value in enumerate(row):
-                    if pd.isna(value):
-                        record[col_idx] = 0
-                    elif isinstance(value, str):
-                        # Handle string values
-                        if value not in string_offsets:
-                            string_offsets[value] = len(string_block)
-                            string_block.extend(value.encode('utf-8') + b'\0')
-                        record[col_idx] = string_offsets[value]
-                    elif isinstance(value, (float, np.float64)):
-                        # Keep float if it's not a whole number
-                        record[col_idx] = int(value) if value.is_integer() else value
-                    else:
-                        # Convert any other numeric types to int
-                        record[col_idx] = int(value)
+            # Edits that fit the file as it is on disk are written in place
+            patches = self._plan_patch(filepath, dataframe) if patch else None
+            if patches is not None:
+                if not self.dbc_file.patch_file(filepath, patches):
+                    return False
+                self.dirty.clear()
+                self._loaded_file = self._file_state(filepath)
+                print(f"Successfully saved {len(patches)} changed fields in place")
+                return True
+
+            # The target file may be the one we are mapping, never write under a live mapping
+            if dataframe is self.dataframe:
+                self._detach_mapping()
+
+            # Build every field as one array; string columns first collect their
+            # distinct values so the block can share bytes across all of them
+            column_types = self.dbc_file.column_types
+            builder = StringBlockBuilder()
+            columns = []
+            string_columns = {}  # Column position -> (per-row codes, builder ids per code)
+            raw_offset_columns = []  # String columns still holding offsets into the old block
+
+            for col_idx in range(len(dataframe.columns)):
+                series = dataframe.iloc[:, col_idx]
+                field_type = column_types[col_idx] if col_idx < len(column_types) else 'int'
+
+                if field_type in ('string', 'loc') or not pd.api.types.is_numeric_dtype(series):
+                    if pd.api.types.is_numeric_dtype(series):
+                        raw_offset_columns.append(col_idx)
+                    string_columns[col_idx] = self._collect_string_column(series, builder)
+                    columns.append(None)
+                else:
+                    columns.append(series.fillna(0).to_numpy())
 
-                self.dbc_file.records.append(record)
+            string_block, offsets = builder.build()
+            for col_idx, (codes, ids) in string_columns.items():
+                # Last slot catches code -1 so missing values map to the empty string
+                lookup = np.append(offsets[ids], np.uint32(0))
+                columns[col_idx] = lookup[codes]
+
+            # Packed before the string block is replaced, out-of-range values leave everything as it was
+            records = self.dbc_file.pack_columns(columns, [str(name) for name in dataframe.columns])
 
             # Update string block
-            self.dbc_file.string_block = bytes(string_block)
-            self.dbc_file.string_offsets = string_offsets  # Update string_offsets
+            old_string_block = self.dbc_file.string_block
+            self.dbc_file.string_block = string_block
+            self.dbc_file.string_offsets = builder.offset_map()  # Update string_offsets
+            self.dbc_file.records = records
 
             # Save the file
+            record_count = len(self.dbc_file.records)
             success = self.dbc_file.save_file(filepath)
+            saved_layout = self.dbc_file.records.dtype
+            self.dbc_file.records = None
+            if success and dataframe is self.dataframe:
+                # The file on disk now matches the DataFrame, later edits can be patched into it
+                self.dbc_file.header = read_header(filepath)
+                self.dbc_file.record_layout = saved_layout
+                self.dirty.clear()
+                self._loaded_file = self._file_state(filepath)
             if success:
-                print(f"Successfully saved {len(self.dbc_file.records)} records")
+                # Raw offsets now have to point into the block that was just written
+                if dataframe is self.dataframe:
+                    for col_idx in raw_offset_columns:
+                        dataframe.isetitem(col_idx, columns[col_idx])
+                        self._column_changed(col_idx)
+                print(f"Successfully saved {record_count} records")
+            else:
+                self.dbc_file.string_block = old_string_block
             return success
 
         except Exception as e:
@@ -246,6 +945,133 @@ class DBCHandler:
             traceback.print_exc()
             return False
 
+    def export_table(self, filepath: str) -> bool:
+        """Write the loaded table, with names, types and decoded strings, to .npz/.arrow/.parquet"""
+        if self.dataframe is None:
+            print("No data to export")
+            return False
+        try:
+            for col_idx in sorted(self._unresolved_strings):
+                self.resolve_string_column(col_idx)
+            columnar.export_table(self.dataframe, filepath, self._table_metadata())
+            print(f"Exported {len(self.dataframe)} records to {filepath}")
+            return True
+        except Exception as e:
+            print(f"Error exporting table: {str(e)}")
+            return False
+
+    def import_table(self, filepath: str, use_mmap: bool = True) -> bool:
+        """Load a table written by export_table, mapping its columns where the format allows"""
+        try:
+            dataframe, metadata = columnar.import_table(filepath, mmap=use_mmap)
+        except Exception as e:
+            print(f"Error importing table: {str(e)}")
+            return False
+
+        self._remember_table()
+        self._pending_cache = None
+        self.dbc_file.close()
+        self.dbc_file = DBCFile()  # No DBC file backs the table, saving builds one from scratch
+        self._use_table(dataframe, metadata)
+        self.current_table_name = metadata.get('table') or Path(filepath).stem
+        self._loaded_file = None
+        print(f"Imported {len(dataframe)} records of {self.current_table_name} from {filepath}")
+        return True
+
+    def _table_metadata(self) -> dict:
+        """What a columnar copy of the table needs besides its columns"""
+        definition = self.definition_handler.current_definition_file
+        return {
+            'table': self.current_table_name,
+            'definition': Path(definition).name if definition else None,
+            'column_types': list(self.dbc_file.column_types),
+            'locale_columns': {str(col_idx): locale for col_idx, locale in self.locale_columns.items()},
+            'index_column': self.index_column,
+        }
+
+    def _use_table(self, dataframe: pd.DataFrame, metadata: dict):
+        """Adopt a table read back from a columnar file"""
+        self.dbc_file.set_column_types(metadata.get('column_types') or ['int'] * len(dataframe.columns))
+        self.dataframe = dataframe
+        self.chunk_iterator = None
+        self.locale_columns = {int(col_idx): locale for col_idx, locale in metadata.get('locale_columns', {}).items()}
+        self._unresolved_strings = set()
+        # Columns may be read-only views of the file, they are copied on first edit
+        self._mapped_columns = set(range(len(dataframe.columns)))
+        self.index_column = metadata.get('index_column')
+        self.dirty.clear()
+        self.change_set = None
+        self.history.clear()
+        self._build_primary_key()
+
+    def _file_state(self, filepath: str):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return os.path.normcase(os.path.abspath(filepath)), stat.st_mtime_ns, stat.st_size
+
+    def can_patch(self, filepath: str, dataframe: pd.DataFrame) -> bool:
+        """Whether saving would only overwrite changed fields in place"""
+        return self._plan_patch(filepath, dataframe) is not None
+
+    def _plan_patch(self, filepath: str, dataframe: pd.DataFrame):
+        """(file offset, bytes) writes that bring the file up to date, or None if it needs a rewrite.
+
+        Patching needs the target to be the untouched file the records came
+        from, the same record count and layout, and every changed string to
+        already exist in the string block.
+        """
+        if dataframe is not self.dataframe or self.dirty.structure_changed:
+            return None
+        if self._loaded_file is None or self._file_state(filepath) != self._loaded_file:
+            return None
+        header, layout = self.dbc_file.header, self.dbc_file.record_layout
+        if (header is None or layout is None or layout.itemsize != header.record_size
+                or len(layout.names) != len(dataframe.columns) or header.record_count != len(dataframe.index)):
+            return None
+        if self.dirty.cell_count() > PATCH_CELL_LIMIT:
+            return None
+
+        column_types = self.dbc_file.column_types
+        patches = []
+        for col_idx in self.dirty.columns():
+            rows = self.dirty.rows(col_idx)
+            field_offset, dtype = self.dbc_file.field_slot(col_idx)
+            series = dataframe.iloc[rows, col_idx]
+            field_type = column_types[col_idx] if col_idx < len(column_types) else 'int'
+
+            if not pd.api.types.is_numeric_dtype(series):
+                offsets = [self.dbc_file.find_string('' if pd.isna(value) else str(value)) for value in series]
+                if any(offset is None for offset in offsets):
+                    return None  # A new string needs a new string block
+                values = np.array(offsets, dtype=np.int64)
+            else:
+                values = series.fillna(0).to_numpy()
+
+            stored = values.astype(dtype)
+            if field_type != 'float' and not np.array_equal(stored.astype(np.int64), values.astype(np.int64)):
+                return None  # Out of range for the stored field type
+
+            positions = 20 + rows * header.record_size + field_offset
+            data = stored.tobytes()
+            size = dtype.itemsize
+            patches.extend(
+                (int(position), data[i * size:(i + 1) * size]) for i, position in enumerate(positions)
+            )
+        return patches
+
+    def _collect_string_column(self, series: pd.Series, builder: StringBlockBuilder) -> tuple:
+        """Register a string column's distinct values; returns its per-row codes and their builder ids"""
+        if pd.api.types.is_numeric_dtype(series):
+            # Still raw offsets into the string block the file was loaded with
+            old_offsets, codes = np.unique(series.fillna(0).to_numpy(), return_inverse=True)
+            uniques = [self.dbc_file.get_string(int(offset)) for offset in old_offsets]
+        else:
+            codes, uniques = pd.factorize(series)  # Missing values get code -1
+
+        return codes.reshape(-1), builder.add(uniques)
+
     def get_structure(self):
         """
         Return the structure of the loaded DBC file
@@ -277,26 +1103,7 @@ class DBCHandler:
 
         try:
             current_columns = len(self.dataframe.columns)
-            field_list = []
-            type_list = []
-
-            # Process field definitions
-            for field in field_names:
-                if isinstance(field, dict) and 'name' in field and 'type' in field:
-                    base_name = field['name']
-                    field_type = field['type']
-                    array_size = field.get('array_size', 1)
-
-                    if array_size > 1:
-                        # Add indexed fields for arrays
-                        field_list.extend([f"{base_name}_{i}" for i in range(array_size)])
-                        type_list.extend([field_type] * array_size)
-                    else:
-                        field_list.append(base_name)
-                        type_list.append(field_type)
-                elif isinstance(field, str):
-                    field_list.append(field)
-                    type_list.append('int')  # Default type
+            field_list, type_list, locale_list, index_list = self._expand_fields(field_names)
 
             # Verify field count matches
             print(f"Found {len(field_list)} fields for {current_columns} columns")
@@ -306,6 +1113,7 @@ class DBCHandler:
                 print(f"Adding {current_columns - len(field_list)} generic field names")
                 field_list.extend([f"Field_{i}" for i in range(len(field_list), current_columns)])
                 type_list.extend(['int'] * (current_columns - len(type_list)))
+                locale_list.extend([False] * (current_columns - len(locale_list)))
             elif len(field_list) > current_columns:
                 print(f"Truncating field list from {len(field_list)} to {current_columns}")
                 field_list = field_list[:current_columns]
@@ -314,12 +1122,66 @@ class DBCHandler:
             print(f"Applying field names: {field_list[:5]}...")
             self.dataframe.columns = field_list
             self.dbc_file.set_column_types(type_list)  # Set field types
+
+            # Positions of locale slots (and their flags, locale None) of compound loc fields
+            self.locale_columns = {
+                col_idx: locale for col_idx, locale in enumerate(locale_list[:current_columns])
+                if locale is not False
+            }
+
+            self.index_column = next(
+                (col_idx for col_idx, is_index in enumerate(index_list[:current_columns]) if is_index), None
+            )
+
+            # String offsets are decoded on demand, see get_page and resolve_string_column
+            self._unresolved_strings = {
+                col_idx for col_idx, field_type in enumerate(type_list)
+                if field_type in ('string', 'loc')
+                and pd.api.types.is_integer_dtype(self.dataframe.dtypes.iloc[col_idx])
+            }
             return True
 
         except Exception as e:
             print(f"Error applying field names: {e}")
             return False
 
+    def _expand_fields(self, field_names) -> tuple:
+        """Expand definition fields into per-column name, type, locale and key lists.
+
+        The locale list holds the locale of each slot of a compound `loc`
+        field, None for its flags column and False for ordinary columns. The
+        key list marks the definition's IsIndex columns.
+        """
+        field_list = []
+        type_list = []
+        locale_list = []
+        index_list = []
+
+        for field in field_names or []:
+            if isinstance(field, dict) and 'name' in field and 'type' in field:
+                base_name = field['name']
+                field_type = field['type']
+                array_size = field.get('array_size', 1)
+
+                if array_size > 1:
+                    # Add indexed fields for arrays
+                    field_list.extend([f"{base_name}_{i}" for i in range(array_size)])
+                    type_list.extend([field_type] * array_size)
+                    locale_list.extend([False] * array_size)
+                    index_list.extend([False] * array_size)
+                else:
+                    field_list.append(base_name)
+                    type_list.append(field_type)
+                    locale_list.append(field.get('locale') if 'loc_field' in field else False)
+                    index_list.append(field.get('is_index', False))
+            elif isinstance(field, str):
+                field_list.append(field)
+                type_list.append('int')  # Default type
+                locale_list.append(False)
+                index_list.append(False)
+
+        return field_list, type_list, locale_list, index_list
+
     def load_dbc_chunks(self, filepath: str, chunk_size: int = 1000) -> bool:
         """Load DBC file in large chunks with efficient memory management"""
         try:
@@ -332,7 +1194,7 @@ class DBCHandler:
 
             self.dataframe = pd.DataFrame()
 
-            first_chunk = pd.DataFrame(self.dbc_file.records[:chunk_size])
+            first_chunk = self._records_to_dataframe(self.dbc_file.records[:chunk_size])
             if self.use_dtype_optimization:
                 self._optimize_datatypes(first_chunk)
             self.dataframe = first_chunk
@@ -354,7 +1216,7 @@ class DBCHandler:
                 return pd.DataFrame()
 
             try:
-                next_chunk = next(iter(self.chunk_iterator))
+                next_chunk = next(self.chunk_iterator)
                 if self.use_dtype_optimization:
                     self._optimize_datatypes(next_chunk)
                 return next_chunk
@@ -369,6 +1231,7 @@ class DBCHandler:
 
     def cleanup(self):
         try:
+            self.flush_table_cache()
             self.chunks = []
             self.current_chunk = 0
             if hasattr(self, 'dataframe'):
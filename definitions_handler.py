@@ -1,25 +1,175 @@
+import hashlib
+import os
 import xml.etree.ElementTree as ET
 from pathlib import Path
+from core.definition_index import DefinitionIndex
+from dbc.dbc_format import field_layout
+
+DEFINITIONS_DIR = Path(__file__).resolve().parent / "Definitions"
+
+# String slots of a `loc` field, in the order they are stored in the record
+LOCALES = ['enUS', 'koKR', 'frFR', 'deDE', 'zhCN', 'zhTW', 'esES', 'esMX',
+           'ruRU', 'jaJP', 'ptPT', 'itIT', 'Unk12', 'Unk13', 'Unk14', 'Unk15']
+DEFAULT_LOCALE = 'enUS'
+
+def locale_count(build: int) -> int:
+    """Number of locale string slots a `loc` field has in a given client build.
+
+    Classic and earlier store 8 slots plus a flags word, TBC and WotLK 16 plus
+    flags. From Cataclysm on a `loc` field is a single string.
+    """
+    if build < 6005:
+        return 8
+    if build < 13164:
+        return 16
+    return 0
+
+_definition_index = None
+_definition_store = None
+
+def parser_version() -> str:
+    """Hash of this module, which holds the definition parser; any change recompiles the index"""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+def get_definition_index() -> DefinitionIndex:
+    """Get the compiled definition index shared by every DefinitionsHandler"""
+    global _definition_index
+    if _definition_index is None:
+        _definition_index = DefinitionIndex(
+            DEFINITIONS_DIR,
+            lambda path: DefinitionsHandler()._parse_definition_file(ET.parse(path).getroot()),
+            parser_version=parser_version()
+        )
+    return _definition_index
+
+def get_definition_store() -> 'DefinitionStore':
+    """Get the resident build store shared by every DefinitionsHandler"""
+    global _definition_store
+    if _definition_store is None:
+        _definition_store = DefinitionStore(get_definition_index())
+    return _definition_store
+
+class DefinitionStore:
+    """Keeps every loaded definition build resident at once.
+
+    Tables whose field layout is identical in several builds share a single
+    field list, so holding all builds costs little more than the distinct
+    layouts, and switching or comparing builds is a dictionary lookup.
+    """
+
+    def __init__(self, index: DefinitionIndex):
+        self.index = index
+        self.builds = {}  # Definition file key -> {table name: fields}
+        self._build_stats = {}  # Definition file key -> (mtime_ns, size) the build was loaded from
+        self._layouts = {}  # Layout key -> shared field list
+        self._fields = {}  # Field key -> shared field dict
+        self.signatures = {}  # (table name, field_count, record_size) -> definition files
+        self._build_signatures = {}  # Definition file key -> signatures it is listed under
+        self._layout_signatures = {}  # id(shared field list) -> (field_count, record_size)
+        self._all_loaded = False
+
+    def _key(self, definition_file) -> str:
+        return os.path.normcase(os.path.abspath(definition_file))
+
+    def _field_key(self, field: dict) -> tuple:
+        return tuple(sorted(field.items()))
+
+    def get_build(self, definition_file) -> dict:
+        """Get the tables of a build, loading it from the index the first time"""
+        key = self._key(definition_file)
+        stat = os.stat(definition_file)
+        if self._build_stats.get(key) != (stat.st_mtime_ns, stat.st_size):
+            tables = {}
+            shared = {}  # Each table is listed under its name and its lowercase name
+            for table_name, fields in self.index.get_tables(definition_file).items():
+                if id(fields) not in shared:
+                    interned = [self._fields.setdefault(self._field_key(field), field) for field in fields]
+                    # Shared field dicts live as long as the store, so their ids identify a layout
+                    layout_key = tuple(id(field) for field in interned)
+                    shared[id(fields)] = self._layouts.setdefault(layout_key, interned)
+                tables[table_name] = shared[id(fields)]
+            self.builds[key] = tables
+            self._build_stats[key] = (stat.st_mtime_ns, stat.st_size)
+            self._register_signatures(key, definition_file, tables)
+        return self.builds[key]
+
+    def load_all(self, definition_files=None):
+        """Make every given build resident, by default every file in the definitions folder"""
+        if definition_files is None:
+            if self._all_loaded:
+                return
+            definition_files = sorted(str(path) for path in self.index.definitions_dir.glob("*.xml"))
+            self._all_loaded = True
+        # Stale files are re-parsed and the index written once, not once per file
+        definition_files = list(definition_files)
+        self.index.compile_all(definition_files)
+        for definition_file in definition_files:
+            self.get_build(definition_file)
+
+    def _layout_signature(self, fields) -> tuple:
+        """Header field_count and record_size a table layout produces in a WDBC file"""
+        signature = self._layout_signatures.get(id(fields))
+        if signature is None:
+            types = [field['type'] for field in fields]
+            # 64-bit fields count as two fields in the header
+            field_count = sum(2 if field_type in ('long', 'ulong') else 1 for field_type in types)
+            signature = (field_count, field_layout(types).itemsize)
+            self._layout_signatures[id(fields)] = signature
+        return signature
+
+    def _register_signatures(self, key, definition_file, tables):
+        """List a build's tables under their header signatures"""
+        for signature in self._build_signatures.pop(key, []):
+            self.signatures[signature] = [
+                other for other in self.signatures[signature] if self._key(other) != key
+            ]
+
+        build_signatures = []
+        for table_name in {name.lower() for name in tables}:
+            signature = (table_name,) + self._layout_signature(tables[table_name])
+            self.signatures.setdefault(signature, []).append(definition_file)
+            build_signatures.append(signature)
+        self._build_signatures[key] = build_signatures
+
+    def match(self, table_name: str, field_count: int, record_size: int) -> list:
+        """Definition files whose layout of a table matches a DBC header"""
+        return self.signatures.get((table_name.lower(), field_count, record_size), [])
+
+    def compare_table(self, table_name: str, definition_file_a, definition_file_b) -> dict:
+        """Compare one table's field layout between two builds"""
+        fields_a = self.get_build(definition_file_a).get(table_name.lower()) or []
+        fields_b = self.get_build(definition_file_b).get(table_name.lower()) or []
+        if fields_a is fields_b:
+            return {'identical': True, 'added': [], 'removed': [], 'changed': []}
+
+        by_name_a = {field['name']: field for field in fields_a}
+        by_name_b = {field['name']: field for field in fields_b}
+        return {
+            'identical': False,
+            'added': [name for name in by_name_b if name not in by_name_a],
+            'removed': [name for name in by_name_a if name not in by_name_b],
+            'changed': [
+                name for name in by_name_a
+                if name in by_name_b and by_name_a[name] != by_name_b[name]
+            ]
+        }
 
 class DefinitionsHandler:
     def __init__(self):
         self.definitions = {}
-        self.definitions_path = Path("definitions")
+        self.definitions_path = DEFINITIONS_DIR
+        self.index = get_definition_index()
+        self.store = get_definition_store()
+        self.current_definition_file = None
 
     def load_definition(self, definition_file: str) -> bool:
-        """Load a single definition file."""
+        """Switch to a definition file, keeping previously loaded builds resident."""
         try:
-            self.definitions.clear()  # Clear previous definitions
-            tree = ET.parse(definition_file)
-            root = tree.getroot()
-            tables = self._parse_definition_file(root)
+            # The parser already stores a lowercase key per table for case-insensitive lookup
+            self.definitions = self.store.get_build(definition_file)
+            self.current_definition_file = definition_file
 
-            for table_name, fields in tables.items():
-                self.definitions[table_name] = fields
-                self.definitions[table_name.lower()] = fields  # Case-insensitive lookup
-
-            print(f"Successfully loaded definition file: {definition_file}")
-            print(f"Loaded tables: {list(tables.keys())}")
+            print(f"Successfully loaded definition file: {definition_file} ({len(self.definitions) // 2} tables)")
             return True
 
         except Exception as e:
@@ -34,7 +184,8 @@ class DefinitionsHandler:
             if not table_name:  # Skip if no name
                 continue
 
-            print(f"Processing table definition: {table_name}")  # Debug print
+            build = table.get('Build')
+            locales = LOCALES[:locale_count(int(build))] if build else []
             fields = []
             for field in table.findall('Field'):
                 field_info = {
@@ -47,14 +198,21 @@ class DefinitionsHandler:
                     continue
 
                 if field_info['array_size'] > 1:
-                    for i in range(field_info['array_size']):
+                    names = [f"{field_info['name']}_{i}" for i in range(field_info['array_size'])]
+                else:
+                    names = [field_info['name']]
+
+                for name in names:
+                    if field_info['type'] == 'loc' and locales:
+                        fields.extend(self._expand_loc_field(name, locales))
+                    elif field_info['array_size'] > 1:
                         fields.append({
-                            'name': f"{field_info['name']}_{i}",
+                            'name': name,
                             'type': field_info['type'],
                             'is_index': field_info['is_index']
                         })
-                else:
-                    fields.append(field_info)
+                    else:
+                        fields.append(field_info)
 
             if fields:
                 # Store both original and lowercase versions
@@ -64,6 +222,24 @@ class DefinitionsHandler:
         print(f"Parsed {len(tables)//2} unique tables")  # Debug print
         return tables
 
+    def _expand_loc_field(self, name: str, locales: list) -> list:
+        """Expand a `loc` field into one string column per locale plus its flags column"""
+        fields = [{
+            'name': f"{name}_{locale}",
+            'type': 'loc',
+            'is_index': False,
+            'loc_field': name,
+            'locale': locale
+        } for locale in locales]
+        fields.append({
+            'name': f"{name}_Flags",
+            'type': 'uint',
+            'is_index': False,
+            'loc_field': name,
+            'locale': None
+        })
+        return fields
+
     def _get_table_definition(self, table_name: str):
         """Get table definition with case-insensitive matching"""
         if not table_name:
@@ -89,8 +265,11 @@ class DefinitionsHandler:
 
         return None
 
-    def get_field_names(self, table_name: str) -> list:
-        """Get field names with case-insensitive matching"""
+    def get_field_names(self, table_name: str, definition_file: str = None) -> list:
+        """Get field names with case-insensitive matching, from the current or another build"""
+        if definition_file is not None:
+            return self.store.get_build(definition_file).get(table_name.lower()) or []
+
         table_def = self._get_table_definition(table_name)
         if not table_def:
             print(f"No definition found for table: {table_name}")
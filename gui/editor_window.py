@@ -23,11 +23,21 @@ class EditorWindow:
                 self.table_view.setup()
 
         self.loading_modal.setup()
+        self.file_manager.set_loading_modal(self.loading_modal)
 
+        dpg.set_viewport_resize_callback(self.table_view.on_viewport_resized)
         dpg.setup_dearpygui()
         dpg.show_viewport()
         dpg.set_primary_window("primary_window", True)
 
+    def poll(self):
+        """Per-frame housekeeping: hand finished background work to the GUI"""
+        self.file_manager.poll()
+
+    def shutdown(self):
+        self.file_manager.worker.shutdown()
+        self.file_manager.dbc_handler.flush_table_cache()
+
     def _setup_menu_bar(self):
         with dpg.menu_bar():
             with dpg.menu(label="File"):
@@ -40,9 +50,23 @@ class EditorWindow:
                 dpg.add_separator()
                 dpg.add_menu_item(label="Exit",
                                 callback=lambda: dpg.stop_dearpygui())
+            with dpg.menu(label="Edit"):
+                dpg.add_menu_item(label="Undo", shortcut="Ctrl+Z",
+                                callback=self.table_view.undo)
+                dpg.add_menu_item(label="Redo", shortcut="Ctrl+Y",
+                                callback=self.table_view.redo)
             with dpg.menu(label="Data"):
                 dpg.add_menu_item(label="Show Statistics",
                                 callback=self.table_view.show_stats)
+                dpg.add_menu_item(label="Bulk Edit",
+                                callback=self.table_view.show_bulk_edit)
+                dpg.add_separator()
+                dpg.add_menu_item(label="Compare With File",
+                                callback=self.file_manager.show_compare_dialog)
+                dpg.add_menu_item(label="Export Changes",
+                                callback=self.file_manager.show_export_changes_dialog)
+                dpg.add_menu_item(label="Clear Comparison",
+                                callback=self.table_view.clear_changes)
 
     def _setup_definition_selector(self):
         with dpg.group(horizontal=True):
@@ -53,7 +77,8 @@ class EditorWindow:
                 items=definition_names,
                 callback=self.file_manager.on_definition_changed,
                 default_value=definition_names[0] if definition_names else "",
-                width=300
+                width=300,
+                tag="definition_selector"
             )
 
     def create_table(self, table_data):
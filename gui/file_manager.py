@@ -1,8 +1,10 @@
 import dearpygui.dearpygui as dpg
 from pathlib import Path
 import os
-from definitions_handler import DefinitionsHandler  # Import DefinitionsHandler
+from definitions_handler import DefinitionsHandler, DEFINITIONS_DIR  # Import DefinitionsHandler
 from dbc_handler import DBCHandler  # Import DBCHandler
+from core.worker import BackgroundWorker, Job
+from core.header_scan import find_dbc_files, scan_headers
 import json
 from typing import List, Dict
 
@@ -15,10 +17,14 @@ class FileManager:
         self.search_filter = ""
         self.definition_files = []
         self.definitions_handler = DefinitionsHandler()  # Initialize DefinitionsHandler
-        self.dbc_handler = DBCHandler()  # Initialize DBCHandler
+        self.dbc_handler = DBCHandler(use_mmap=True)  # Initialize DBCHandler
         self.table_view = table_view  # Reference to TableView
         self.current_definition_file = None  # Track current definition file
         self.has_unsaved_changes = False
+        self.loading_modal = None
+        self.worker = BackgroundWorker()  # Loads, saves and definition switches run off the GUI thread
+        self.user_cancelled = False
+        self.file_info = {}  # Path -> header ScanResult of files in the list
 
     def setup(self):
         self._setup_file_dialogs()
@@ -46,7 +52,32 @@ class FileManager:
             width=700,
             height=400,
             modal=True
-        ): pass
+        ):
+            dpg.add_checkbox(label="Include subfolders", tag="folder_recursive")
+
+        with dpg.file_dialog(
+            directory_selector=False,
+            show=False,
+            callback=self.compare_dialog_callback,
+            tag="compare_dialog_id",
+            width=700,
+            height=400,
+            modal=True
+        ):
+            dpg.add_file_extension(".dbc", color=(0, 255, 0, 255))
+
+        with dpg.file_dialog(
+            directory_selector=False,
+            show=False,
+            callback=self.export_changes_dialog_callback,
+            tag="export_changes_dialog_id",
+            default_filename="changes",
+            width=700,
+            height=400,
+            modal=True
+        ):
+            dpg.add_file_extension(".csv", color=(0, 255, 0, 255))
+            dpg.add_file_extension(".json", color=(0, 255, 0, 255))
 
     def _setup_file_list(self):
         with dpg.child_window(width=200, height=-1, tag="file_list_window"):
@@ -68,10 +99,14 @@ class FileManager:
 
     def _scan_definition_files(self):
         """Scan for XML definition files in the definitions directory."""
-        definitions_path = Path("definitions")
+        definitions_path = DEFINITIONS_DIR
         if definitions_path.exists() and definitions_path.is_dir():
-            self.definition_files = [str(file) for file in definitions_path.glob("*.xml")]
-            print(f"Found definition files: {self.definition_files}")  # Debug print
+            self.definition_files = sorted(str(file) for file in definitions_path.glob("*.xml"))
+            print(f"Found {len(self.definition_files)} definition files")
+            # Compile any new or changed XML so later loads are a single index read,
+            # then keep every build resident so switching is a lookup
+            self.definitions_handler.index.compile_all(self.definition_files)
+            self.definitions_handler.store.load_all(self.definition_files)
         else:
             print("Definitions directory not found or empty.")
 
@@ -93,39 +128,102 @@ class FileManager:
         """Show the folder dialog for opening directories"""
         dpg.show_item("folder_dialog_id")
 
+    def show_compare_dialog(self):
+        """Pick another version of the loaded file to compare it with"""
+        if self.dbc_handler.dataframe is None:
+            print("Load a file before comparing")
+            return
+        dpg.show_item("compare_dialog_id")
+
+    def show_export_changes_dialog(self):
+        if self.dbc_handler.change_set is None:
+            print("No comparison to export")
+            return
+        dpg.show_item("export_changes_dialog_id")
+
+    def set_loading_modal(self, loading_modal):
+        self.loading_modal = loading_modal
+        loading_modal.set_cancel_callback(self.cancel_loading)
+
+    def is_busy(self) -> bool:
+        """True while a load or save is running or queued"""
+        return self.worker.is_busy()
+
+    def poll(self):
+        """Deliver background job progress and results, called once per frame"""
+        self.worker.poll()
+
+    def cancel_loading(self):
+        """Cancel the job the loading indicator shows and any queued cancellable work"""
+        self.user_cancelled = True
+        self.worker.cancel()
+
+    def _on_job_progress(self, job, fraction, message):
+        if self.loading_modal:
+            self.loading_modal.update_progress(fraction, message or f"{job.label} ({fraction:.0%})")
+
+    def _on_job_done(self, job):
+        if self.loading_modal and not self.worker.is_busy():
+            self.loading_modal.show(False)
+
+    def _start_job(self, key, func, on_done, label, cancellable=True) -> Job:
+        # An open cell editor would write into the table the job replaces or saves
+        self.table_view.close_editor()
+        if self.loading_modal:
+            self.loading_modal.show(cancellable=cancellable)
+            self.loading_modal.update_progress(0.0, label)
+        return self.worker.submit(Job(key, func, on_done=on_done, on_progress=self._on_job_progress,
+                                      cancellable=cancellable, label=label))
+
     def save_file(self) -> bool:
-        """Coordinate saving the current file"""
+        """Coordinate saving the current file in the background"""
         if not self.successfully_loaded_file:
             print("No file is currently loaded for saving")
             return False
 
-        try:
-            df = self.table_view.get_current_data()
-            if df is None:
-                print("No data to save - TableView returned None")
-                return False
+        df = self.table_view.get_current_data()
+        if df is None:
+            print("No data to save - TableView returned None")
+            return False
 
-            # Create backup before saving
-            backup_path = f"{self.successfully_loaded_file}.bak"
-            try:
-                import shutil
-                shutil.copy2(self.successfully_loaded_file, backup_path)
-                print(f"Created backup at {backup_path}")
-            except Exception as e:
-                print(f"Warning: Could not create backup: {str(e)}")
+        if self.is_busy():
+            print("Cannot save while a file is loading or saving")
+            return False
 
-            print(f"Attempting to save file: {self.successfully_loaded_file}")
-            success = self.dbc_handler.save_dbc(self.successfully_loaded_file, df)
+        filepath = self.successfully_loaded_file
+        self._start_job("save", lambda job: self._save_file_now(filepath, df), self._on_save_done,
+                        f"Saving {os.path.basename(filepath)}", cancellable=False)
+        return True
+
+    def _on_save_done(self, job, success, error):
+        if success:
+            self.has_unsaved_changes = False
+            # Refresh table view
+            self.table_view.update_view(self.dbc_handler.dataframe)
+        self._on_job_done(job)
+
+    def _save_file_now(self, filepath, df) -> bool:
+        """Save a file, restoring it from a backup if writing fails"""
+        try:
+            # Create backup before saving, in-place patches restore their own bytes instead
+            backup_path = f"{filepath}.bak"
+            import shutil
+            if not self.dbc_handler.can_patch(filepath, df):
+                try:
+                    shutil.copy2(filepath, backup_path)
+                    print(f"Created backup at {backup_path}")
+                except Exception as e:
+                    print(f"Warning: Could not create backup: {str(e)}")
+
+            print(f"Attempting to save file: {filepath}")
+            success = self.dbc_handler.save_dbc(filepath, df)
 
             if success:
-                self.has_unsaved_changes = False
-                print(f"Successfully saved to {self.successfully_loaded_file}")
-                # Refresh table view
-                self.table_view.update_view(df)
+                print(f"Successfully saved to {filepath}")
             else:
                 # Restore from backup if save failed
                 if os.path.exists(backup_path):
-                    shutil.copy2(backup_path, self.successfully_loaded_file)
+                    shutil.copy2(backup_path, filepath)
                     print("Restored from backup due to save failure")
                 print("Failed to save file - DBC Handler returned False")
 
@@ -159,10 +257,8 @@ class FileManager:
             if selected_path.lower().endswith('.dbc'):
                 self.dbc_files = [selected_path]
                 self.update_file_list()
-                # Only set current_file if load is successful
-                if self.load_file(selected_path):
-                    self.current_file = selected_path
-                    print(f"Successfully set current file to: {self.current_file}")
+                # current_file is only set once the load succeeds
+                self.load_file(selected_path)
             else:
                 print("Selected file is not a DBC file.")
         except Exception as e:
@@ -171,11 +267,75 @@ class FileManager:
     def folder_dialog_callback(self, sender, app_data):
         """Handle folder selection from dialog"""
         folder_path = app_data['file_path_name']
-        self.dbc_files = []
-        # Scan for DBC files in the selected folder
-        for file in Path(folder_path).glob("*.dbc"):
-            self.dbc_files.append(str(file))
-        self.update_file_list()
+        recursive = dpg.get_value("folder_recursive")
+
+        def scan(job):
+            # Only the 20-byte headers are read, the records stay on disk
+            files = find_dbc_files(folder_path, recursive)
+            job.report(0.1, f"Reading {len(files)} headers...")
+            return files, scan_headers(files)
+
+        def on_done(job, result, error):
+            if result:
+                files, results = result
+                self.dbc_files = files
+                self.file_info = {info.path: info for info in results}
+                print(f"Scanned {len(files)} DBC files in {folder_path}")
+                self.update_file_list()
+            self._on_job_done(job)
+
+        # Only headers are read and scan_headers has no cancellation points
+        self._start_job("scan", scan, on_done, f"Scanning {os.path.basename(folder_path) or folder_path}",
+                        cancellable=False)
+
+    def compare_dialog_callback(self, sender, app_data):
+        """Compare the loaded table with the selected file in the background"""
+        other_path = app_data.get('file_path_name')
+        if not other_path or not os.path.isfile(other_path):
+            print(f"File does not exist: {other_path}")
+            return
+        if self.is_busy():
+            print("Cannot compare while a file is loading or saving")
+            return
+
+        def compare(job):
+            callback = lambda fraction: job.report(fraction, f"Reading {os.path.basename(other_path)} ({fraction:.0%})")
+            return self.dbc_handler.diff_with(other_path, callback)
+
+        def on_done(job, change_set, error):
+            if change_set is not None:
+                self.table_view.show_changes(change_set)
+            self._on_job_done(job)
+
+        self._start_job("compare", compare, on_done, f"Comparing with {os.path.basename(other_path)}")
+
+    def export_changes_dialog_callback(self, sender, app_data):
+        filepath = app_data.get('file_path_name')
+        if filepath:
+            self.dbc_handler.export_changes(filepath)
+
+    def describe_file(self, filepath: str) -> str:
+        """One-line summary of a scanned file: records, fields, size and matching definition"""
+        info = self.file_info.get(filepath)
+        if info is None:
+            return ""
+        size = f"{info.size / 1024:,.0f} KB" if info.size >= 1024 else f"{info.size} B"
+        if info.header is None:
+            return f"{size}, {info.error}"
+
+        header = info.header
+        table_name = Path(filepath).stem
+        matches = self.definitions_handler.store.match(table_name, header.field_count, header.record_size)
+        if self.current_definition_file in matches:
+            definition = Path(self.current_definition_file).stem
+        elif len(matches) == 1:
+            definition = Path(matches[0]).stem
+        elif matches:
+            definition = f"{len(matches)} matching definitions"
+        else:
+            definition = "no definition"
+        summary = f"{header.record_count:,} x {header.field_count}, {size}, {definition}"
+        return f"{summary} ({info.error})" if info.error else summary
 
     def get_definition_names(self):
         """Get list of available definition files"""
@@ -187,27 +347,47 @@ class FileManager:
         selected_definition = app_data
         definition_path = next((file for file in self.definition_files if os.path.basename(file) == selected_definition), None)
         if definition_path:
-            self.current_definition_file = definition_path
-            # Load the selected definition file
-            if self.load_definition_file(definition_path):
-                # Reload current DBC file to apply new definitions
-                if self.current_file and self.current_file.lower().endswith('.dbc'):
-                    self.load_file(self.current_file)
+            # Loading the definition also reloads the current DBC file
+            self.load_definition_file(definition_path)
 
     def load_definition_file(self, filepath):
-        """Load the selected definition file"""
+        """Switch to the selected definition file and reload the current DBC file with it"""
         print(f"Loading definition file: {filepath}")  # Debug print
-        success = self.definitions_handler.load_definition(filepath)
-        if success:
+        reload_file = self.current_file if self.current_file and self.current_file.lower().endswith('.dbc') else None
+
+        def switch(job):
+            if not self.definitions_handler.load_definition(filepath):
+                return False
             print(f"Successfully loaded definition file: {filepath}")
             # Update DBCHandler's definition handler
             self.dbc_handler.definition_handler = self.definitions_handler
+            self.dbc_handler.last_definition_file = filepath
+            self.dbc_handler.current_definition_file = filepath
+            self.dbc_handler.selected_definition_file = filepath
             # Reload current DBC file if one is loaded
-            if self.current_file and self.current_file.lower().endswith('.dbc'):
-                print(f"Reloading current DBC file with new definitions: {self.current_file}")
-                self.load_file(self.current_file)
-        else:
-            print(f"Failed to load definition file: {filepath}")
+            if reload_file:
+                print(f"Reloading current DBC file with new definitions: {reload_file}")
+                self._load_file_now(reload_file, job)
+            return True
+
+        def on_done(job, success, error):
+            if success:
+                self.current_definition_file = filepath
+            else:
+                print(f"Failed to load definition file: {filepath}")
+            self._on_load_done(job, reload_file if success else None)
+
+        # A definition switch reloads the file, so it shares the load queue
+        self._start_job("load", switch, on_done, f"Loading {os.path.basename(filepath)}")
+        return True
+
+    def _sync_detected_definition(self):
+        """Reflect a definition build picked from the file header in the selector"""
+        detected = self.dbc_handler.definition_handler.current_definition_file
+        if detected and detected != self.current_definition_file:
+            self.current_definition_file = detected
+            if dpg.does_item_exist("definition_selector"):
+                dpg.set_value("definition_selector", os.path.basename(detected))
 
     def update_file_list(self):
         """Update the file list in the UI"""
@@ -230,6 +410,10 @@ class FileManager:
                     tag=button_tag
                 )
 
+                description = self.describe_file(file)
+                if description:
+                    dpg.add_text(description, color=(160, 160, 160, 255), wrap=190)
+
                 tooltip_tag = f"tooltip_{hash(file)}"
                 with dpg.tooltip(parent=button_tag, tag=tooltip_tag):
                     dpg.add_text(file)
@@ -242,29 +426,48 @@ class FileManager:
         return [f for f in self.dbc_files if search_text in os.path.basename(f).lower()]
 
     def load_file(self, filepath):
-        """Load the selected DBC file"""
+        """Queue loading the selected DBC file, replacing any load still pending"""
         print(f"Loading DBC file: {filepath}")
 
-        # Ensure current definition is loaded
+        # The selected definition stays loaded between files
         if self.current_definition_file:
             print(f"Using definition file: {self.current_definition_file}")
-            self.load_definition_file(self.current_definition_file)
         else:
             print("Warning: No definition file selected")
 
-        try:
-            if self.dbc_handler.load_dbc(filepath):
-                print(f"Successfully loaded DBC file: {filepath}")
-                self.table_view.update_view(self.dbc_handler.dataframe)
-                self.successfully_loaded_file = filepath
-                self.has_unsaved_changes = False
-                return True
-            else:
-                print(f"Failed to load DBC file: {filepath}")
-                return False
-        except Exception as e:
-            print(f"Error loading file: {e}")
-            return False
+        self.user_cancelled = False
+        self._start_job("load", lambda job: self._load_file_now(filepath, job),
+                        lambda job, success, error: self._on_load_done(job, filepath if success else None),
+                        f"Loading {os.path.basename(filepath)}")
+        return True
+
+    def _load_file_now(self, filepath, job=None) -> bool:
+        """Load a DBC file into the handler, reporting progress to the job"""
+        callback = (lambda fraction: job.report(fraction, f"Loading {os.path.basename(filepath)} ({fraction:.0%})")) if job else None
+        if self.dbc_handler.load_dbc(filepath, callback):
+            print(f"Successfully loaded DBC file: {filepath}")
+            return True
+        print(f"Failed to load DBC file: {filepath}")
+        return False
+
+    def _on_load_done(self, job, filepath):
+        """Show the result of a finished load on the GUI thread"""
+        if job.state == "cancelled":
+            print(f"Cancelled: {job.label}")
+            if self.user_cancelled and self.successfully_loaded_file and not self.worker.is_busy():
+                # The cancelled load already released the previous file, bring it back
+                self.load_file(self.successfully_loaded_file)
+                return
+        elif filepath:
+            self.current_file = filepath
+            self._sync_detected_definition()
+            self.table_view.update_view(self.dbc_handler.dataframe)
+            self.successfully_loaded_file = filepath
+            self.has_unsaved_changes = False
+
+        if self.dbc_handler.dataframe is None and not self.worker.is_busy():
+            self.table_view.update_view(None)
+        self._on_job_done(job)
 
     def get_string(self, offset: int) -> str:
         """Get string from string block at given offset"""
@@ -4,17 +4,27 @@ class LoadingModal:
     def __init__(self):
         self.loading_check_tag = "loading_check"
         self.loading_queue_tag = "loading_queue"
+        self.cancel_callback = None
 
     def setup(self):
         """Initialize the loading modal window"""
-        with dpg.window(label="Loading", modal=True, show=False, tag="loading_modal",
-                       no_close=True, width=300, height=100,
+        # Not modal, so picking another file while loading replaces the pending load
+        with dpg.window(label="Loading", modal=False, show=False, tag="loading_modal",
+                       no_close=True, no_collapse=True, width=300, height=110,
                        pos=[dpg.get_viewport_width() // 2 - 150,
                             dpg.get_viewport_height() // 2 - 50]):
-            dpg.add_text("Loading DBC file...")
             dpg.add_text("Preparing to load...", tag="loading_status")
+            dpg.add_progress_bar(default_value=0.0, width=-1, tag="loading_progress")
+            dpg.add_button(label="Cancel", callback=self._on_cancel, tag="loading_cancel")
 
-    def show(self, show=True):
+    def set_cancel_callback(self, callback):
+        self.cancel_callback = callback
+
+    def _on_cancel(self):
+        if self.cancel_callback:
+            self.cancel_callback()
+
+    def show(self, show=True, cancellable=True):
         """Show or hide the loading indicator with progress"""
         if show:
             # Center the loading modal
@@ -22,11 +32,19 @@ class LoadingModal:
             height = dpg.get_viewport_height()
             dpg.configure_item("loading_modal",
                              pos=[width // 2 - 150, height // 2 - 50])
+            dpg.configure_item("loading_cancel", show=cancellable)
             dpg.show_item("loading_modal")
             dpg.set_value("loading_status", "Preparing to load...")
+            dpg.set_value("loading_progress", 0.0)
         else:
             dpg.hide_item("loading_modal")
 
     def update_status(self, message: str):
         """Update the loading status message"""
         dpg.set_value("loading_status", message)
+
+    def update_progress(self, fraction: float, message: str = None):
+        """Update the progress bar and, optionally, the status message"""
+        dpg.set_value("loading_progress", max(0.0, min(1.0, fraction)))
+        if message:
+            self.update_status(message)
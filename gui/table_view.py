@@ -1,19 +1,52 @@
 import dearpygui.dearpygui as dpg
 import math
+import numpy as np
 import pandas as pd
 import traceback
+from definitions_handler import LOCALES, DEFAULT_LOCALE
+
+ROW_HEIGHT = 23  # Approximate height of one table row in pixels
+COLUMN_WIDTH = 120
+LABEL_WIDTH = {"vertical": 70, "horizontal": 200}
+WHEEL_ROWS = 3  # Rows scrolled per mouse wheel notch
+# Text inputs whose own Ctrl+Z/Ctrl+Y must not also undo table edits
+TEXT_INPUTS = ("cell_editor_input", "search_input", "go_to_id_input", "bulk_edit_assignment", "bulk_edit_where")
 
 class TableView:
+    """Virtualized grid over the loaded DataFrame.
+
+    The table holds a fixed pool of cells sized to the viewport. Paging and
+    scrolling only move the row/column offsets and relabel the existing
+    cells; the pool is rebuilt only when its shape changes. Cells are plain
+    selectables, and a single shared input widget is shown over a cell when
+    it is clicked for editing.
+    """
+
     def __init__(self):
         self.table_tag = "dbc_table"
         self.view_mode = "vertical"  # "vertical" shows data in rows, "horizontal" shows data in columns
-        self.page_size = 100  # Number of records per page
+        self.page_size = 100  # Number of rows in the cell pool, updated from the viewport size
         self.current_page = 0
         self.total_pages = 0
         self.current_data = None
         self.current_headers = []
         self.file_manager = None  # Will be set after creation
         self.dataframe = None  # Add this line to store the DataFrame
+        self.display_columns = []  # DataFrame column positions shown in the table
+        self.row_offset = 0  # First item on the table's vertical axis
+        self.col_offset = 0  # First item on the table's horizontal axis
+        self.pool_shape = None  # (view mode, rows, columns) of the current cell pool
+        self.header_cells = []
+        self.label_cells = []
+        self.cells = []  # cells[pool_row][pool_col]
+        self.editing = None  # (row_idx, col_idx) of the cell being edited
+        self.sort_specs = []  # (column position, ascending) of the active sort keys
+        self.row_order = None  # Row permutation being paged through, None for table order
+        self.show_references = False  # Show the name of the referenced record next to foreign key IDs
+        self.page_values = None  # Raw values under the pool cells, [pool_row, pool_col]
+        self.change_set = None  # Comparison with another version of the table being shown
+        self.change_rows = None  # Added and changed rows, the only ones shown while comparing
+        self.old_values = {}  # (row, column name) -> value in the other version
 
     def setup(self):
         with dpg.child_window(width=-1, height=-1, tag="content_window"):
@@ -27,6 +60,19 @@ class TableView:
                     horizontal=True,
                     tag="view_mode_selector"
                 )
+                dpg.add_text("Locale:")
+                dpg.add_combo(
+                    items=LOCALES,
+                    default_value=DEFAULT_LOCALE,
+                    callback=self.on_locale_changed,
+                    width=80,
+                    tag="locale_selector"
+                )
+                dpg.add_checkbox(
+                    label="Show references",
+                    callback=self.on_show_references_changed,
+                    tag="show_references_checkbox"
+                )
 
             # Add pagination controls
             with dpg.group(horizontal=True, tag="pagination_controls"):
@@ -35,216 +81,509 @@ class TableView:
                 dpg.add_text("Page: ", tag="page_indicator")
                 dpg.add_button(label=">", callback=lambda: self.change_page("next"))
                 dpg.add_button(label=">>", callback=lambda: self.change_page("last"))
+                dpg.add_text("Column:")
+                dpg.add_slider_int(
+                    min_value=0,
+                    max_value=0,
+                    width=200,
+                    callback=self.on_column_offset_changed,
+                    tag="column_offset_slider"
+                )
+                dpg.add_text("", tag="sort_indicator")
+                dpg.add_text("", tag="diff_indicator")
+                dpg.add_text("Go to ID:")
+                dpg.add_input_int(
+                    width=100,
+                    step=0,
+                    on_enter=True,
+                    callback=lambda s, a: self.go_to_id(a),
+                    tag="go_to_id_input"
+                )
+
+        with dpg.handler_registry():
+            dpg.add_mouse_wheel_handler(callback=self._on_mouse_wheel)
+            dpg.add_key_press_handler(dpg.mvKey_Escape, callback=lambda: self.close_editor())
+            dpg.add_key_press_handler(dpg.mvKey_Z, callback=lambda: self._on_history_key(self.undo))
+            dpg.add_key_press_handler(dpg.mvKey_Y, callback=lambda: self._on_history_key(self.redo))
+
+        # Shared editor shown over whichever cell is being edited
+        with dpg.window(tag="cell_editor", show=False, no_title_bar=True, no_resize=True,
+                        no_move=True, autosize=True):
+            dpg.add_input_text(tag="cell_editor_input", width=COLUMN_WIDTH * 2, on_enter=True,
+                               callback=self._on_cell_edit)
+
+    def _axis_lengths(self) -> tuple:
+        """Number of items along the table's vertical and horizontal axes"""
+        if self.dataframe is None:
+            return 0, 0
+        if self.view_mode == "horizontal":
+            return len(self.display_columns), self._row_count()
+        return self._row_count(), len(self.display_columns)
+
+    def _row_count(self) -> int:
+        """Rows in the view, fewer than the table's while only changed rows are shown"""
+        return len(self.dataframe.index) if self.row_order is None else len(self.row_order)
+
+    def _cell_position(self, pool_row: int, pool_col: int) -> tuple:
+        """DataFrame (row, column) position shown by a pool cell"""
+        if self.view_mode == "horizontal":
+            return self._row_at(self.col_offset + pool_col), self.display_columns[self.row_offset + pool_row]
+        return self._row_at(self.row_offset + pool_row), self.display_columns[self.col_offset + pool_col]
+
+    def _row_at(self, position: int) -> int:
+        """DataFrame row shown at a position of the (possibly sorted) view"""
+        if position >= self._row_count():
+            raise IndexError(position)
+        return position if self.row_order is None else int(self.row_order[position])
+
+    def _rows_at(self, start: int, count: int):
+        """DataFrame rows shown at a range of view positions, a slice when unsorted"""
+        if self.row_order is None:
+            return slice(start, start + count)
+        return self.row_order[start:start + count]
+
+    def _pool_size(self) -> tuple:
+        """Rows and columns of cells that fit in the viewport"""
+        try:
+            width = dpg.get_viewport_client_width()
+            height = dpg.get_viewport_client_height()
+        except Exception:
+            width, height = 1280, 800
+        # Leave room for the file list, menus and controls
+        rows = max(5, (height - 160) // ROW_HEIGHT)
+        cols = max(1, (width - 240 - LABEL_WIDTH[self.view_mode]) // COLUMN_WIDTH)
+        total_rows, total_cols = self._axis_lengths()
+        return min(rows, max(total_rows, 1)), min(cols, max(total_cols, 1))
 
     def change_page(self, direction):
         if not hasattr(self, 'dataframe') or self.dataframe is None:
             return
 
+        total_rows, _ = self._axis_lengths()
+        last_offset = max(0, total_rows - self.page_size)
         if direction == "first":
-            self.current_page = 0
+            self.row_offset = 0
         elif direction == "prev":
-            self.current_page = max(0, self.current_page - 1)
+            self.row_offset = max(0, self.row_offset - self.page_size)
         elif direction == "next":
-            self.current_page = min(self.total_pages - 1, self.current_page + 1)
+            self.row_offset = min(last_offset, self.row_offset + self.page_size)
         elif direction == "last":
-            self.current_page = self.total_pages - 1
+            self.row_offset = last_offset
+
+        self._refresh_cells()
+
+    def go_to_id(self, record_id: int) -> bool:
+        """Jump to the page holding the record with an ID"""
+        if self.dataframe is None or not self._is_handler_data() or self._is_busy():
+            return False
+        row_idx = self.file_manager.dbc_handler.row_of_id(record_id)
+        if row_idx is None:
+            print(f"No record with ID {record_id}")
+            return False
+
+        if self.row_order is not None:
+            shown = np.flatnonzero(self.row_order == row_idx)
+            if len(shown) == 0:
+                print(f"Record {record_id} is not among the shown rows")
+                return False
+            row_idx = int(shown[0])
+        if self.view_mode == "horizontal":
+            self.col_offset = row_idx
+        else:
+            self.row_offset = (row_idx // self.page_size) * self.page_size
+        self._refresh_cells()
+        return True
+
+    def get_by_id(self, record_id: int):
+        """The record with an ID, or None"""
+        if not self._is_handler_data():
+            return None
+        return self.file_manager.dbc_handler.get_by_id(record_id)
+
+    def scroll_rows(self, delta: int):
+        """Move the visible window by a number of rows"""
+        if self.dataframe is None:
+            return
+        total_rows, _ = self._axis_lengths()
+        self.row_offset = min(max(0, self.row_offset + delta), max(0, total_rows - self.page_size))
+        self._refresh_cells()
 
-        self.update_view(self.dataframe)
+    def _on_mouse_wheel(self, sender, app_data):
+        if self._is_busy():
+            return
+        if self.dataframe is not None and dpg.does_item_exist(self.table_tag) and dpg.is_item_hovered(self.table_tag):
+            self.scroll_rows(-int(app_data) * WHEEL_ROWS)
+
+    def on_sort(self, sender, sort_specs):
+        """Sort by the data columns under the clicked headers"""
+        if self.dataframe is None or self._is_busy():
+            return
+        self.sort_specs = []
+        for column_item, direction in sort_specs or []:
+            if column_item not in self.header_cells:
+                continue
+            position = self.col_offset + self.header_cells.index(column_item)
+            if position < len(self.display_columns):
+                self.sort_specs.append((self.display_columns[position], direction > 0))
+        self._apply_sort()
+        self._refresh_cells()
+
+    def _apply_sort(self):
+        """Fetch the row permutation for the active sort keys from the handler's cache"""
+        self.row_order = None
+        if self.sort_specs and self._is_handler_data():
+            columns, ascending = zip(*self.sort_specs)
+            self.row_order = self.file_manager.dbc_handler.sort_rows(list(columns), list(ascending))
+        if self.change_rows is not None:
+            order = self.row_order if self.row_order is not None else np.arange(len(self.dataframe.index))
+            self.row_order = order[np.isin(order, self.change_rows)]
+        if dpg.does_item_exist("sort_indicator"):
+            dpg.set_value("sort_indicator", "Sorted by: " + ", ".join(
+                f"{self.dataframe.columns[col_idx]} {'asc' if ascending else 'desc'}"
+                for col_idx, ascending in self.sort_specs
+            ) if self.sort_specs and self.row_order is not None else "")
+
+    def on_column_offset_changed(self, sender, app_data):
+        self.col_offset = int(app_data)
+        self._refresh_cells()
+
+    def on_viewport_resized(self, sender=None, app_data=None):
+        if self.dataframe is not None:
+            self.update_view(self.dataframe)
 
     def on_view_mode_changed(self, sender, app_data):
         """Handle view mode change"""
         self.view_mode = app_data.lower()
+        self.row_offset = 0
+        self.col_offset = 0
         if hasattr(self, 'dataframe') and self.dataframe is not None:
             self.update_view(self.dataframe)
 
+    def on_locale_changed(self, sender, app_data):
+        """Show another locale of loc fields"""
+        if self.file_manager:
+            self.file_manager.dbc_handler.set_locale(app_data)
+        if self.dataframe is not None:
+            self.update_view(self.dataframe)
+
+    def show_changes(self, change_set):
+        """Show only the added and changed rows of a comparison, with the old value of each changed field"""
+        self.change_set = change_set
+        self.change_rows = np.union1d(change_set.changed_rows, change_set.added_rows)
+        self.old_values = change_set.old_value_map()
+        self.row_offset = 0
+        if dpg.does_item_exist("diff_indicator"):
+            dpg.set_value("diff_indicator", f"Changes: {change_set.summary()}")
+        self._apply_sort()
+        self._refresh_cells()
+
+    def clear_changes(self):
+        self.change_set = None
+        self.change_rows = None
+        self.old_values = {}
+        if dpg.does_item_exist("diff_indicator"):
+            dpg.set_value("diff_indicator", "")
+        if self.dataframe is not None:
+            self._apply_sort()
+            self._refresh_cells()
+
+    def on_show_references_changed(self, sender, app_data):
+        self.show_references = bool(app_data)
+        self._refresh_cells()
+
     def update_view(self, dataframe):
         try:
-            if dpg.does_item_exist(self.table_tag):
-                dpg.delete_item(self.table_tag)
-
+            self.close_editor()
+            if dataframe is not self.dataframe:
+                # Another table, the previous sort keys and comparison don't apply
+                self.sort_specs = []
+                self.change_set = None
+                self.change_rows = None
+                self.old_values = {}
+                if dpg.does_item_exist("diff_indicator"):
+                    dpg.set_value("diff_indicator", "")
             self.dataframe = dataframe  # Store the DataFrame
             if dataframe is None or dataframe.empty:
-                with dpg.table(tag=self.table_tag, parent="content_window"):
-                    dpg.add_table_column(label="No Data")
-                    with dpg.table_row():
-                        dpg.add_text("No data to display")
+                self._show_message("No Data", "No data to display")
                 return
 
-            # Calculate pagination
-            total_records = len(dataframe.index if self.view_mode == "vertical" else dataframe.columns)
-            self.total_pages = math.ceil(total_records / self.page_size)
-            self.current_page = min(self.current_page, self.total_pages - 1)
-
-            # Update page indicator
-            if dpg.does_item_exist("page_indicator"):
-                dpg.set_value("page_indicator", f"Page: {self.current_page + 1} / {self.total_pages}")
-
-            # Calculate slice for current page
-            start_idx = self.current_page * self.page_size
-            end_idx = min(start_idx + self.page_size, total_records)
-
-            # Slice the dataframe based on view mode
-            if self.view_mode == "horizontal":
-                # For horizontal view, we transpose the data to show columns as rows
-                df_to_display = dataframe.iloc[:, start_idx:end_idx].transpose()
+            # Other locales of loc fields stay hidden (and undecoded)
+            if self._is_handler_data():
+                self.display_columns = self.file_manager.dbc_handler.get_display_columns()
             else:
-                df_to_display = dataframe.iloc[start_idx:end_idx]
+                self.display_columns = list(range(len(dataframe.columns)))
 
-            with dpg.table(tag=self.table_tag, parent="content_window",
-                          header_row=True, borders_innerH=True,
-                          borders_outerH=True, borders_innerV=True,
-                          borders_outerV=True, scrollY=True, scrollX=True,
-                          freeze_rows=1, height=-1,
-                          policy=dpg.mvTable_SizingFixedFit):
+            self._apply_sort()
+            rows, cols = self._pool_size()
+            self.page_size = rows
+            if self.pool_shape != (self.view_mode, rows, cols):
+                self._build_pool(rows, cols)
 
-                if self.view_mode == "horizontal":
-                    self._create_horizontal_view(df_to_display)
-                else:  # vertical view
-                    self._create_vertical_view(df_to_display)
+            self._refresh_cells()
 
         except Exception as e:
             print(f"Error updating view: {str(e)}")
             traceback.print_exc()
-            # Create error table
-            with dpg.table(tag=self.table_tag, parent="content_window"):
-                dpg.add_table_column(label="Error")
+            self._show_message("Error", f"Error updating view: {str(e)}")
+
+    def _is_handler_data(self) -> bool:
+        return (self.file_manager is not None
+                and self.dataframe is self.file_manager.dbc_handler.dataframe)
+
+    def _is_busy(self) -> bool:
+        """The handler's data is being replaced or written by a background job"""
+        return self.file_manager is not None and self.file_manager.is_busy()
+
+    def _show_message(self, label: str, message: str):
+        """Replace the cell pool with a one-cell message table"""
+        if dpg.does_item_exist(self.table_tag):
+            dpg.delete_item(self.table_tag)
+        self.pool_shape = None
+        self.cells = []
+        with dpg.table(tag=self.table_tag, parent="content_window"):
+            dpg.add_table_column(label=label)
+            with dpg.table_row():
+                dpg.add_text(message)
+
+    def _build_pool(self, rows: int, cols: int):
+        """Create the fixed grid of cells that every page is drawn into"""
+        if dpg.does_item_exist(self.table_tag):
+            dpg.delete_item(self.table_tag)
+
+        with dpg.table(tag=self.table_tag, parent="content_window",
+                      header_row=True, borders_innerH=True,
+                      borders_outerH=True, borders_innerV=True,
+                      borders_outerV=True, scrollX=True,
+                      freeze_rows=1, height=-1,
+                      policy=dpg.mvTable_SizingFixedFit,
+                      # Header clicks sort by data columns, only meaningful when columns are fields
+                      sortable=self.view_mode == "vertical", sort_multi=True,
+                      sort_tristate=True, callback=self.on_sort):
+            dpg.add_table_column(label="", width_fixed=True, no_sort=True,
+                                 init_width_or_weight=LABEL_WIDTH[self.view_mode])
+            self.header_cells = [
+                dpg.add_table_column(label="", width_fixed=True, init_width_or_weight=COLUMN_WIDTH)
+                for _ in range(cols)
+            ]
+
+            self.label_cells = []
+            self.cells = []
+            for pool_row in range(rows):
                 with dpg.table_row():
-                    dpg.add_text(f"Error updating view: {str(e)}")
+                    self.label_cells.append(dpg.add_text(""))
+                    self.cells.append([
+                        dpg.add_selectable(label="", user_data=(pool_row, pool_col),
+                                           callback=self._begin_edit)
+                        for pool_col in range(cols)
+                    ])
+
+        self.pool_shape = (self.view_mode, rows, cols)
+
+    def _refresh_cells(self):
+        """Relabel the pool cells with the data at the current offsets"""
+        if self.dataframe is None or not self.cells or self._is_busy():
+            return
 
-    def _create_horizontal_view(self, df):
         try:
-            if df.empty:
-                dpg.add_table_column(label="No Data")
-                with dpg.table_row():
-                    dpg.add_text("No data to display")
-                return
+            rows, cols = len(self.cells), len(self.header_cells)
+            total_rows, total_cols = self._axis_lengths()
+            self.row_offset = min(self.row_offset, max(0, total_rows - rows))
+            self.col_offset = min(self.col_offset, max(0, total_cols - cols))
+            row_count = min(rows, total_rows - self.row_offset)
+            col_count = min(cols, total_cols - self.col_offset)
+
+            # Only the visible window is sliced, string offsets are decoded for it alone
+            if self.view_mode == "horizontal":
+                page_rows = self._rows_at(self.col_offset, col_count)
+                page_columns = self.display_columns[self.row_offset:self.row_offset + row_count]
+            else:
+                page_rows = self._rows_at(self.row_offset, row_count)
+                page_columns = self.display_columns[self.col_offset:self.col_offset + col_count]
 
-            # Add field names column with fixed width
-            dpg.add_table_column(label="Field Name", width_fixed=True, init_width_or_weight=200)
-
-            # Add data columns (paginated)
-            for col_idx in range(len(df.columns)):
-                try:
-                    col_label = f"{col_idx + (self.current_page * self.page_size)}"
-                    dpg.add_table_column(label=col_label,
-                                       width_fixed=True,
-                                       init_width_or_weight=120)
-                except Exception as e:
-                    print(f"Error adding column {col_idx}: {str(e)}")
-                    continue
-
-            # Add rows in chunks
-            chunk_size = 50  # Process rows in smaller chunks
-            for chunk_start in range(0, len(df.index), chunk_size):
-                try:
-                    chunk_end = min(chunk_start + chunk_size, len(df.index))
-                    for row_idx, (field_name, row) in enumerate(df.iloc[chunk_start:chunk_end].iterrows(), start=chunk_start):
-                        with dpg.table_row():
-                            dpg.add_text(str(field_name))  # Field name is not editable
-                            for col_idx, value in enumerate(row):
-                                cell_tag = f"cell_{row_idx}_{col_idx}"
-                                dpg.add_input_text(
-                                    default_value=str(value) if pd.notna(value) else "",
-                                    tag=cell_tag,
-                                    width=-1,
-                                    on_enter=True,
-                                    callback=lambda s, a, u: self._on_cell_edit(s, a, u)
-                                )
-                except Exception as e:
-                    print(f"Error processing chunk {chunk_start}-{chunk_end}: {str(e)}")
-                    continue
+            if self._is_handler_data():
+                page = self.file_manager.dbc_handler.get_page(page_rows, page_columns)
+            else:
+                page = self.dataframe.iloc[page_rows, page_columns]
+
+            values = page.to_numpy(dtype=object)
+            labels = values.copy()
+            names = [str(name) for name in page.columns]
+            row_positions = list(range(page_rows.start, page_rows.stop)) if isinstance(page_rows, slice) else page_rows.tolist()
+            if self.show_references and self._is_handler_data():
+                # Referenced tables are joined for the visible rows only
+                references = self.file_manager.dbc_handler.get_reference_labels(page_rows, page_columns)
+                for page_col, col_idx in enumerate(page_columns):
+                    if col_idx in references:
+                        labels[:, page_col] = [
+                            f"{value} ({name})" if pd.notna(name) else value
+                            for value, name in zip(values[:, page_col], references[col_idx])
+                        ]
+            if self.old_values:
+                for page_row, row_idx in enumerate(row_positions):
+                    for page_col, name in enumerate(names):
+                        if (row_idx, name) in self.old_values:
+                            labels[page_row, page_col] = f"{labels[page_row, page_col]} (was {self.old_values[row_idx, name]})"
+            # Rows are labelled with their table position, which differs from the view's when sorted
+            added = (np.isin(row_positions, self.change_set.added_rows) if self.change_set is not None
+                     else np.zeros(len(row_positions), dtype=bool))
+            positions = [f"+{row}" if is_added else str(row) for row, is_added in zip(row_positions, added)]
+            if self.view_mode == "horizontal":
+                values = values.T
+                labels = labels.T
+                header_labels = positions
+                row_labels = names
+            else:
+                header_labels = names
+                row_labels = positions
+
+            for pool_col, header in enumerate(self.header_cells):
+                dpg.configure_item(header, label=header_labels[pool_col] if pool_col < col_count else "")
+
+            for pool_row, row_cells in enumerate(self.cells):
+                in_rows = pool_row < row_count
+                dpg.set_value(self.label_cells[pool_row], row_labels[pool_row] if in_rows else "")
+                for pool_col, cell in enumerate(row_cells):
+                    if in_rows and pool_col < col_count:
+                        value = labels[pool_row, pool_col]
+                        dpg.configure_item(cell, label=str(value) if pd.notna(value) else "", enabled=True)
+                    else:
+                        dpg.configure_item(cell, label="", enabled=False)
+
+            self.page_values = values
+
+            # Update page indicator and column slider
+            self.total_pages = max(1, math.ceil(total_rows / rows))
+            self.current_page = min(self.row_offset // rows, self.total_pages - 1)
+            if dpg.does_item_exist("page_indicator"):
+                dpg.set_value("page_indicator",
+                              f"Page: {self.current_page + 1} / {self.total_pages} "
+                              f"(rows {self.row_offset}-{self.row_offset + row_count - 1} of {total_rows})")
+            if dpg.does_item_exist("column_offset_slider"):
+                dpg.configure_item("column_offset_slider", max_value=max(0, total_cols - cols))
+                dpg.set_value("column_offset_slider", self.col_offset)
 
         except Exception as e:
-            print(f"Error in horizontal view: {str(e)}")
+            print(f"Error refreshing cells: {str(e)}")
             traceback.print_exc()
-            # Add error message to table
-            dpg.add_table_column(label="Error")
-            with dpg.table_row():
-                dpg.add_text(f"Error displaying data: {str(e)}")
 
-    def _create_vertical_view(self, df):
+    def _begin_edit(self, sender, app_data, user_data):
+        """Open the shared editor over a clicked cell"""
+        dpg.set_value(sender, False)  # Cells are not meant to stay selected
+        if self._is_busy():
+            return
+        pool_row, pool_col = user_data
         try:
-            if df.empty:
-                dpg.add_table_column(label="No Data")
-                with dpg.table_row():
-                    dpg.add_text("No data to display")
-                return
+            self.editing = self._cell_position(pool_row, pool_col)
+        except IndexError:
+            return
 
-            # Add columns based on field names
-            for col in df.columns:
-                try:
-                    dpg.add_table_column(label=str(col), width_fixed=True, init_width_or_weight=120)
-                except Exception as e:
-                    print(f"Error adding column {col}: {str(e)}")
-                    continue
-
-            # Add rows with editable cells
-            for idx, row in df.iterrows():
-                try:
-                    with dpg.table_row():
-                        for col_idx, value in enumerate(row):
-                            cell_tag = f"cell_{idx}_{col_idx}"
-                            dpg.add_input_text(
-                                default_value=str(value) if pd.notna(value) else "",
-                                tag=cell_tag,
-                                width=-1,
-                                on_enter=True,
-                                callback=lambda s, a, u: self._on_cell_edit(s, a, u)
-                            )
-                except Exception as e:
-                    print(f"Error processing row {idx}: {str(e)}")
-                    continue
+        # The cell label may carry a reference name, the editor starts from the raw value
+        value = self.page_values[pool_row, pool_col]
+        dpg.set_value("cell_editor_input", str(value) if pd.notna(value) else "")
+        x, y = dpg.get_mouse_pos(local=False)
+        dpg.configure_item("cell_editor", pos=[int(x), int(y)], show=True)
+        dpg.focus_item("cell_editor_input")
 
-        except Exception as e:
-            print(f"Error in vertical view: {str(e)}")
-            traceback.print_exc()
-            # Add error message to table
-            dpg.add_table_column(label="Error")
-            with dpg.table_row():
-                dpg.add_text(f"Error displaying data: {str(e)}")
+    def close_editor(self):
+        """Hide the cell editor without applying its value"""
+        self.editing = None
+        if dpg.does_item_exist("cell_editor"):
+            dpg.hide_item("cell_editor")
 
     def _on_cell_edit(self, sender, app_data, user_data):
         """Handle cell value changes"""
         try:
-            # Extract row and column indices from cell tag
-            _, row_idx, col_idx = sender.split("_")
-            row_idx = int(row_idx) + (self.current_page * self.page_size)  # Adjust for pagination
-            col_idx = int(col_idx)
-
-            # Update the dataframe
-            if self.dataframe is not None:
-                # Retrieve the corresponding column type
-                field_type = self.file_manager.dbc_handler.dbc_file.column_types[col_idx]
-
-                # Convert value based on column type
-                try:
-                    current_value = self.dataframe.iloc[row_idx, col_idx]
-                    if field_type == "numeric":
-                        if pd.api.types.is_float_dtype(self.dataframe.dtypes[col_idx]):
-                            new_value = float(app_data)
-                        else:
-                            new_value = int(app_data)
-                    elif field_type == "string":
-                        new_value = app_data
-                    else:
-                        new_value = app_data
+            if self.editing is None or self.dataframe is None:
+                return
+            if self._is_busy():
+                # The worker is replacing or writing the handler's table
+                self.close_editor()
+                return
+            row_idx, col_idx = self.editing
+
+            try:
+                current_value = self.dataframe.iloc[row_idx, col_idx]
+
+                # The handler converts the text to the column's type and copies mapped columns first
+                self.file_manager.dbc_handler.set_cell(row_idx, col_idx, app_data)
+                print(f"Updated cell [{row_idx}][{col_idx}] from {current_value} to {app_data}")
 
-                    # Update the value
-                    self.dataframe.iloc[row_idx, col_idx] = new_value
-                    print(f"Updated cell [{row_idx}][{col_idx}] from {current_value} to {new_value}")
+                # Mark file as having unsaved changes
+                if self.file_manager:
+                    self.file_manager.mark_unsaved_changes()
 
-                    # Mark file as having unsaved changes
-                    if self.file_manager:
-                        self.file_manager.mark_unsaved_changes()
+            except (ValueError, TypeError) as e:
+                print(f"Invalid value: {str(e)}")
 
-                except ValueError as e:
-                    print(f"Invalid value: {str(e)}")
-                    # Revert to original value
-                    dpg.set_value(sender, str(current_value))
+            self.close_editor()
+            self._apply_sort()  # The edit may have moved the row
+            self._refresh_cells()
 
         except Exception as e:
             print(f"Error in cell edit: {str(e)}")
 
+    def show_bulk_edit(self):
+        """Dialog for setting a column on every row that matches a condition"""
+        if not self._is_handler_data() or self._is_busy():
+            return
+        if dpg.does_item_exist("bulk_edit_window"):
+            dpg.show_item("bulk_edit_window")
+            return
+        with dpg.window(label="Bulk Edit", tag="bulk_edit_window", width=460, height=170,
+                        pos=[dpg.get_viewport_width() // 2 - 230,
+                             dpg.get_viewport_height() // 2 - 85]):
+            dpg.add_input_text(label="Set", hint="Points = Points * 2", width=340, tag="bulk_edit_assignment")
+            dpg.add_input_text(label="Where", hint="Category == 92 (empty for every row)", width=340,
+                               tag="bulk_edit_where")
+            dpg.add_button(label="Apply", callback=self._on_bulk_edit)
+            dpg.add_text("", tag="bulk_edit_result", wrap=440)
+
+    def _on_bulk_edit(self, sender=None, app_data=None):
+        if not self._is_handler_data() or self._is_busy():
+            return
+        handler = self.file_manager.dbc_handler
+        changed = handler.bulk_edit(dpg.get_value("bulk_edit_assignment"), dpg.get_value("bulk_edit_where"))
+        if changed is None:
+            dpg.set_value("bulk_edit_result", "Failed, see the log for the reason")
+            return
+        dpg.set_value("bulk_edit_result", f"Changed {changed:,} records")
+        if changed:
+            self.file_manager.mark_unsaved_changes()
+            self.close_editor()
+            self._apply_sort()  # Edited values may have moved rows
+            self._refresh_cells()
+
+    def _on_history_key(self, step):
+        """Ctrl+Z / Ctrl+Y, unless a cell or other text input is being edited (it has its own undo)"""
+        if self.editing is not None or not dpg.is_key_down(dpg.mvKey_Control):
+            return
+        if any(dpg.does_item_exist(tag) and dpg.is_item_active(tag) for tag in TEXT_INPUTS):
+            return
+        step()
+
+    def undo(self, sender=None, app_data=None):
+        self._step_history(self.file_manager.dbc_handler.undo)
+
+    def redo(self, sender=None, app_data=None):
+        self._step_history(self.file_manager.dbc_handler.redo)
+
+    def _step_history(self, step):
+        if not self._is_handler_data() or self._is_busy():
+            return
+        self.close_editor()
+        if not step():
+            return
+        self.file_manager.mark_unsaved_changes()
+        handler = self.file_manager.dbc_handler
+        if handler.dataframe is not self.dataframe:
+            # Rows were inserted or deleted: the sort stays, compared rows no longer line up
+            self.dataframe = handler.dataframe
+            self.clear_changes()
+            self.update_view(handler.dataframe)
+        else:
+            self._apply_sort()
+            self._refresh_cells()
+
     def show_stats(self):
         if self.dataframe is None:
             return
@@ -9,7 +9,12 @@ def main():
     editor = EditorWindow(VERSION)
     editor.setup()
 
-    dpg.start_dearpygui()
+    # Manual render loop so background job results are applied on this thread
+    while dpg.is_dearpygui_running():
+        editor.poll()
+        dpg.render_dearpygui_frame()
+
+    editor.shutdown()
     dpg.destroy_context()
 
 if __name__ == "__main__":